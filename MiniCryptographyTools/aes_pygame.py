@@ -11,6 +11,7 @@ class AESWindow(Window):
 
         self.page_state = "menu"
         self.show_debug = False
+        self.mouse_click = False
 
         self.create_buttons()
 
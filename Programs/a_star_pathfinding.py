@@ -1,4 +1,6 @@
 import heapq
+import time
+from collections import deque
 import numpy as np
 
 class Node:
@@ -38,6 +40,9 @@ class Maze:
         self.height = self.maze_map.shape[0]
         self.width = self.maze_map.shape[1]
 
+        # Connected component labels for each set of adjacent coordinates, built when first needed
+        self.component_labels = {}
+
     def to_string(self):
         string_representation = ""
         for i in range(self.height):
@@ -62,7 +67,70 @@ class Maze:
         return self.width
 
     def set_point_at_position(self, position, value):
+        was_walkable = self.check_if_walkable(position)
         self.maze_map[position[0]][position[1]] = value
+        is_walkable = self.check_if_walkable(position)
+
+        if was_walkable == is_walkable or not self.component_labels:
+            return
+
+        if not is_walkable:
+            # Removing a walkable point can split a component, so rebuild the labels next time they are needed
+            self.component_labels = {}
+            return
+
+        # A new walkable point joins all the neighbouring components together
+        for relative_adjacent_coordinates, labels in self.component_labels.items():
+            neighbour_labels = set()
+            for adjacent_position in relative_adjacent_coordinates:
+                neighbour_position = (position[0] + adjacent_position[0], position[1] + adjacent_position[1])
+                if self.check_if_coordinate_is_inside_maze(neighbour_position) and labels[neighbour_position] != -1:
+                    neighbour_labels.add(labels[neighbour_position])
+
+            new_label = position[0] * self.width + position[1]
+            if neighbour_labels:
+                labels[np.isin(labels, list(neighbour_labels))] = new_label
+            labels[position] = new_label
+
+    def get_walkable_mask(self):
+        "Returns a boolean array which is True where the maze is walkable."
+        try:
+            mask = np.asarray(self.is_walkable_function(self.maze_map), dtype=bool)
+            if mask.shape == self.maze_map.shape:
+                return mask
+        except Exception:
+            pass
+        return np.vectorize(self.is_walkable_function, otypes=[bool])(self.maze_map)
+
+    def get_component_labels(self, relative_adjacent_coordinates):
+        """Returns an array with the same shape as the maze where every walkable point holds the label of its connected component and walls hold -1.
+        Two points can reach each other only if they have the same label.
+        The labels are cached and kept up to date by set_point_at_position. Call clear_component_labels after editing maze_map directly."""
+        relative_adjacent_coordinates = tuple(relative_adjacent_coordinates)
+        if relative_adjacent_coordinates not in self.component_labels:
+            self.component_labels[relative_adjacent_coordinates] = label_components(self.get_walkable_mask(), relative_adjacent_coordinates)
+        return self.component_labels[relative_adjacent_coordinates]
+
+    def clear_component_labels(self):
+        self.component_labels = {}
+
+    def check_if_connected(self, start, end, relative_adjacent_coordinates, only_if_cached=False):
+        """Returns False if there is definitely no path from start to end.
+        A start point inside a wall can still step out of it, so only the end point has to be walkable.
+        Points outside the maze are never connected (negative indexes would otherwise wrap around the label array).
+        If only_if_cached is True and the labels haven't been built, returns True instead of building them."""
+        if not self.check_if_coordinate_is_inside_maze(start) or not self.check_if_coordinate_is_inside_maze(end):
+            return False
+        if start == end:
+            return True
+        if only_if_cached and tuple(relative_adjacent_coordinates) not in self.component_labels:
+            return True
+        labels = self.get_component_labels(relative_adjacent_coordinates)
+        if labels[end] == -1:
+            return False
+        if labels[start] == -1:
+            return True
+        return labels[start] == labels[end]
 
     def substitute_values(self, old_to_new_value:dict={0: " ", 1: "\u2588", 2: ".",}):
         return Maze(np.vectorize(old_to_new_value.get)(self.maze_map))
@@ -71,6 +139,54 @@ class Maze:
         for position in path:
             self.set_point_at_position(position, path_value)
 
+def label_components(walkable_mask:np.ndarray, relative_adjacent_coordinates:tuple[tuple]):
+    """Label the connected components of the walkable points, walls are labelled -1.
+
+    One breadth first flood fill per component, so every point is visited once (O(height * width)).
+    The mask is padded with walls so the fill doesn't need bounds checks, and points are stored as flat indexes."""
+    height, width = walkable_mask.shape
+    padding = max([max(abs(row_offset), abs(column_offset)) for row_offset, column_offset in relative_adjacent_coordinates] + [0])
+    padded_width = width + 2 * padding
+    unvisited = np.pad(walkable_mask, padding, constant_values=False).reshape(-1).tolist()
+    neighbour_offsets = [row_offset * padded_width + column_offset for row_offset, column_offset in relative_adjacent_coordinates]
+
+    padded_labels = [-1] * len(unvisited)
+    for first_point, is_unvisited in enumerate(unvisited):
+        if not is_unvisited:
+            continue
+        # The label is the component's first point as an index into the unpadded maze, which is its smallest index
+        label = (first_point // padded_width - padding) * width + first_point % padded_width - padding
+        unvisited[first_point] = False
+        padded_labels[first_point] = label
+        points_to_visit = [first_point]
+        for point in points_to_visit:
+            for offset in neighbour_offsets:
+                neighbour = point + offset
+                if unvisited[neighbour]:
+                    unvisited[neighbour] = False
+                    padded_labels[neighbour] = label
+                    points_to_visit.append(neighbour)
+
+    padded_labels = np.array(padded_labels).reshape(height + 2 * padding, padded_width)
+    return padded_labels[padding:padding + height, padding:padding + width].copy()
+
+class SearchStats:
+    """Counters filled in by astar and anytime_astar when passed as the stats argument.
+    Every search adds to the counts and the wall time, so one SearchStats can total many searches.
+    peak_open_list_size is the largest of any of them. Make a new SearchStats for each search to get separate numbers."""
+    def __init__(self):
+        self.nodes_expanded = 0
+        self.heap_pushes = 0
+        self.heap_pops = 0
+        self.peak_open_list_size = 0
+        self.duplicate_pushes_skipped = 0
+        self.wall_time = 0.0 # In seconds
+
+    def __repr__(self):
+        return (f"nodes expanded: {self.nodes_expanded} heap pushes: {self.heap_pushes} heap pops: {self.heap_pops} "
+                f"peak open list size: {self.peak_open_list_size} duplicate pushes skipped: {self.duplicate_pushes_skipped} "
+                f"wall time: {self.wall_time * 1000:.3f} ms")
+
 def return_path(current_node):
     path = []
     current = current_node
@@ -82,73 +198,387 @@ def return_path(current_node):
 isometric_adjacent_coordinates = ((0, -1), (0, 1), (-1, 0), (1, 0),)
 orthogonal_adjacent_coordinates = ((0, -1), (0, 1), (-1, 0), (1, 0), (-1, -1), (-1, 1), (1, -1), (1, 1),)
 
-def astar(maze, start:tuple[int], end:tuple[int], relative_adjacent_coordinates:tuple[tuple]=isometric_adjacent_coordinates, h_multiplier:int=1):
-    start_node = Node(None, start)
-    end_node = Node(None, end)
-
-    nodes_to_check_list = []
-    checked_nodes_set = set()
-
-    heapq.heapify(nodes_to_check_list) 
-    heapq.heappush(nodes_to_check_list, start_node)
-
-    # Adding a stop condition
-    outer_iterations = 0
-    max_iterations = maze.get_width() * maze.get_height() * 2
-
-    # what squares do we search
-    adjacent_squares = relative_adjacent_coordinates
-
-    # Loop until you find the end
-    while len(nodes_to_check_list) > 0:
-        outer_iterations += 1
-
-        if outer_iterations > max_iterations:
-            raise Exception("Too many iterations for pathfinding.")
-        
-        # Get the current node
-        current_node = heapq.heappop(nodes_to_check_list)
-        checked_nodes_set.add(current_node)
-
-        # Found the goal
-        if current_node == end_node:
-            return return_path(current_node)
-
-        children = []
-        
-        for adjacent_position in adjacent_squares: # Adjacent squares
-            node_position = (current_node.position[0] + adjacent_position[0], current_node.position[1] + adjacent_position[1])
-
-            if not maze.check_if_coordinate_is_inside_maze(node_position):
-                continue
-            if not maze.check_if_walkable(node_position):
+def astar(maze, start:tuple[int], end:tuple[int], relative_adjacent_coordinates:tuple[tuple]=isometric_adjacent_coordinates, h_multiplier:int=1, stats:SearchStats=None, on_expand=None):
+    """Find a path from start to end.
+
+    stats is an optional SearchStats object which gets filled in with search counters, however the search ends.
+    on_expand is an optional function called as on_expand(node, nodes_to_check_list) every time a node is expanded, useful for tracing and visualisation.
+    The counters are local variables which are only copied into stats at the end, so they cost almost nothing when stats is None.
+    Unreachable end points are rejected straight away if the maze's connected component labels are built.
+    Labelling visits the whole maze, so it isn't done here. Call maze.get_component_labels(relative_adjacent_coordinates) first
+    when running many queries on the same maze."""
+    start_time = time.perf_counter()
+    heap_pushes = heap_pops = peak_open_list_size = duplicate_pushes_skipped = 0
+    try:
+        if not maze.check_if_connected(start, end, relative_adjacent_coordinates, only_if_cached=True):
+            raise Exception("Couldn't get a path to destination")
+
+        start_node = Node(None, start)
+        end_node = Node(None, end)
+
+        nodes_to_check_list = []
+        checked_nodes_set = set()
+
+        heapq.heapify(nodes_to_check_list) 
+        heapq.heappush(nodes_to_check_list, start_node)
+        heap_pushes = peak_open_list_size = 1
+
+        # Adding a stop condition
+        outer_iterations = 0
+        max_iterations = maze.get_width() * maze.get_height() * 2
+
+        # what squares do we search
+        adjacent_squares = relative_adjacent_coordinates
+
+        # Loop until you find the end
+        while len(nodes_to_check_list) > 0:
+            outer_iterations += 1
+
+            if outer_iterations > max_iterations:
+                raise Exception("Too many iterations for pathfinding.")
+            
+            # Get the current node
+            current_node = heapq.heappop(nodes_to_check_list)
+            checked_nodes_set.add(current_node)
+            heap_pops += 1
+            if on_expand is not None:
+                on_expand(current_node, nodes_to_check_list)
+
+            # Found the goal
+            if current_node == end_node:
+                return return_path(current_node)
+
+            children = []
+            
+            for adjacent_position in adjacent_squares: # Adjacent squares
+                node_position = (current_node.position[0] + adjacent_position[0], current_node.position[1] + adjacent_position[1])
+
+                if not maze.check_if_coordinate_is_inside_maze(node_position):
+                    continue
+                if not maze.check_if_walkable(node_position):
+                    continue
+
+                new_node = Node(current_node, node_position)
+                children.append(new_node)
+
+            # Loop through children
+            for child in children:
+                # THREE IDENTICAL CODES FOR: If child is on the closed list, continue
+
+                if child in checked_nodes_set:
+                    continue
+
+                child.g = current_node.g + 1            
+                child.h = child.calculate_distance_to_node(end_node)
+                child.f = child.g + child.h * h_multiplier
+
+                # Child is already in the nodes to check list
+                if len([open_node for open_node in nodes_to_check_list if child.position == open_node.position and child.g > open_node.g]) > 0:
+                    duplicate_pushes_skipped += 1
+                    continue
+                # for open_node in nodes_to_check_list:
+                #     if child.position == open_node.position and child.g > open_node.g:
+                #         continue
+
+                # Add the child to the nodes to check list
+                heapq.heappush(nodes_to_check_list, child)
+                heap_pushes += 1
+                if len(nodes_to_check_list) > peak_open_list_size:
+                    peak_open_list_size = len(nodes_to_check_list)
+
+        raise Exception("Couldn't get a path to destination")
+    finally:
+        if stats is not None:
+            stats.nodes_expanded += heap_pops
+            stats.heap_pushes += heap_pushes
+            stats.heap_pops += heap_pops
+            stats.peak_open_list_size = max(stats.peak_open_list_size, peak_open_list_size)
+            stats.duplicate_pushes_skipped += duplicate_pushes_skipped
+            stats.wall_time += time.perf_counter() - start_time
+
+def anytime_astar(maze, start:tuple[int], end:tuple[int], relative_adjacent_coordinates:tuple[tuple]=isometric_adjacent_coordinates,
+                  time_budget_ms:float=None, max_expansions:int=None, initial_h_multiplier:float=3, h_multiplier_step:float=0.5, stats:SearchStats=None):
+    """Anytime Repairing A* (ARA*). Finds a path quickly with a large h_multiplier, then keeps lowering it and repairing the path
+    until it is optimal or the time budget (in milliseconds) or expansion budget runs out.
+
+    Returns (path, bound) where the path is at most bound times longer than the shortest path. A bound of 1 means the path is optimal.
+    Raises an exception if the budget runs out before any path is found.
+    If stats is given its nodes_expanded and wall_time are added to.
+    Like astar, unreachable end points are only rejected early if the maze's component labels are already built."""
+    start_time = time.perf_counter()
+    deadline = start_time + time_budget_ms / 1000 if time_budget_ms is not None else None
+
+    if not maze.check_if_connected(start, end, relative_adjacent_coordinates, only_if_cached=True):
+        raise Exception("Couldn't get a path to destination")
+
+    # Manhattan distance overestimates when diagonal moves are allowed, the bound is only valid with an admissible heuristic
+    if any(row_offset != 0 and column_offset != 0 for row_offset, column_offset in relative_adjacent_coordinates):
+        def heuristic(position):
+            return max(abs(position[0] - end[0]), abs(position[1] - end[1]))
+    else:
+        def heuristic(position):
+            return abs(position[0] - end[0]) + abs(position[1] - end[1])
+
+    h_multiplier = max(1, initial_h_multiplier)
+    g = {start: 0}
+    parents = {start: None}
+    open_keys = {start: h_multiplier * heuristic(start)} # The key each open position was last pushed with
+    open_heap = [(open_keys[start], 0, start)]
+    closed = set()
+    inconsistent = set() # Positions improved after being closed, they are reopened when h_multiplier drops
+    push_count = 1 # Tie breaker so the heap never compares positions
+    expansions = 0
+    out_of_budget = False
+
+    best_path = None
+    best_bound = None
+
+    while True:
+        # Improve path
+        while open_heap:
+            key, _, position = open_heap[0]
+            if open_keys.get(position) != key: # Stale entry
+                heapq.heappop(open_heap)
                 continue
-
-            new_node = Node(current_node, node_position)
-            children.append(new_node)
-
-        # Loop through children
-        for child in children:
-            # THREE IDENTICAL CODES FOR: If child is on the closed list, continue
-
-            if child in checked_nodes_set:
-                continue
-
-            child.g = current_node.g + 1            
-            child.h = child.calculate_distance_to_node(end_node)
-            child.f = child.g + child.h * h_multiplier
-
-            # Child is already in the nodes to check list
-            if len([open_node for open_node in nodes_to_check_list if child.position == open_node.position and child.g > open_node.g]) > 0:
+            if g.get(end, float("inf")) <= key:
+                break
+
+            if max_expansions is not None and expansions >= max_expansions:
+                out_of_budget = True
+                break
+            if deadline is not None and expansions % 64 == 0 and time.perf_counter() > deadline:
+                out_of_budget = True
+                break
+
+            heapq.heappop(open_heap)
+            del open_keys[position]
+            closed.add(position)
+            expansions += 1
+
+            child_g = g[position] + 1
+            for adjacent_position in relative_adjacent_coordinates:
+                child = (position[0] + adjacent_position[0], position[1] + adjacent_position[1])
+                if not maze.check_if_coordinate_is_inside_maze(child) or not maze.check_if_walkable(child):
+                    continue
+                if child_g >= g.get(child, float("inf")):
+                    continue
+
+                g[child] = child_g
+                parents[child] = position
+                if child in closed:
+                    inconsistent.add(child)
+                else:
+                    open_keys[child] = child_g + h_multiplier * heuristic(child)
+                    heapq.heappush(open_heap, (open_keys[child], push_count, child))
+                    push_count += 1
+
+        if end in g:
+            # Sub-optimality bound: the path cost divided by the lowest possible cost of any unfinished position.
+            # This holds even if the budget ran out part way through a pass, h_multiplier only bounds a finished pass
+            lowest_possible_cost = min((g[position] + heuristic(position) for position in (*open_keys, *inconsistent)), default=None)
+            if lowest_possible_cost is None or lowest_possible_cost >= g[end]:
+                bound = 1
+            elif out_of_budget:
+                bound = g[end] / lowest_possible_cost if lowest_possible_cost > 0 else float("inf")
+            else:
+                bound = min(h_multiplier, g[end] / lowest_possible_cost)
+
+            best_path = []
+            position = end
+            while position is not None:
+                best_path.append(position)
+                position = parents[position]
+            best_path.reverse()
+            best_bound = bound
+
+            if bound <= 1 or out_of_budget:
+                break
+        elif out_of_budget or not open_heap:
+            break
+
+        if max_expansions is not None and expansions >= max_expansions or deadline is not None and time.perf_counter() > deadline:
+            break
+
+        # Tighten h_multiplier and reopen inconsistent positions
+        h_multiplier = max(1, h_multiplier - h_multiplier_step)
+        open_keys = {position: g[position] + h_multiplier * heuristic(position) for position in set(open_keys) | inconsistent}
+        inconsistent = set()
+        open_heap = [(key, index, position) for index, (position, key) in enumerate(open_keys.items())]
+        heapq.heapify(open_heap)
+        push_count = len(open_heap)
+        closed = set()
+
+    if stats is not None:
+        stats.nodes_expanded += expansions
+        stats.wall_time += time.perf_counter() - start_time
+
+    if best_path is None:
+        if out_of_budget:
+            raise Exception("Too many iterations for pathfinding.")
+        raise Exception("Couldn't get a path to destination")
+    return best_path, best_bound
+
+class ReservationTable:
+    """Shared record of where planned agents are at each time step, used by CooperativePlanner.
+    A path reserved from start_time has path[i] occupied at time start_time + i, and the agent stays at path[-1] afterwards."""
+    def __init__(self):
+        self.reserved_positions = set() # (position, time)
+        self.reserved_moves = set() # (from_position, to_position, time) moves that finish at time
+        self.last_reserved_time = {} # position: last time anyone passes through it
+        self.parked_positions = {} # position: time an agent arrives and stays there forever
+
+    def is_free(self, position, time):
+        if (position, time) in self.reserved_positions:
+            return False
+        parked_time = self.parked_positions.get(position)
+        return parked_time is None or time < parked_time
+
+    def is_move_free(self, from_position, to_position, time):
+        "Checks that no agent swaps places with this one (moves the other way at the same time)."
+        return (to_position, from_position, time) not in self.reserved_moves
+
+    def can_stay_forever(self, position, time):
+        return time > self.last_reserved_time.get(position, -1) and position not in self.parked_positions
+
+    def reserve_path(self, path, start_time=0):
+        for index, position in enumerate(path):
+            time = start_time + index
+            self.reserved_positions.add((position, time))
+            if index > 0:
+                self.reserved_moves.add((path[index - 1], position, time))
+            if time > self.last_reserved_time.get(position, -1):
+                self.last_reserved_time[position] = time
+        self.parked_positions[path[-1]] = start_time + len(path) - 1
+
+    def clear_before(self, time):
+        "Forget reservations before a time that has already passed, so the table doesn't keep growing every tick."
+        self.reserved_positions = {reservation for reservation in self.reserved_positions if reservation[1] >= time}
+        self.reserved_moves = {reservation for reservation in self.reserved_moves if reservation[2] >= time}
+
+    def clear(self):
+        self.reserved_positions.clear()
+        self.reserved_moves.clear()
+        self.last_reserved_time.clear()
+        self.parked_positions.clear()
+
+class CooperativePlanner:
+    """Plans collision free paths for many agents on the same maze with space-time A* and a shared ReservationTable.
+    Agents are planned one after another in priority order, each avoiding the agents planned before it.
+    True distance tables to each goal are computed once and reused by every agent heading to that goal.
+
+    Paths are lists of positions, one per time step, and can include waiting in place.
+    max_expansions limits the states searched for each agent, so one agent that can't get through doesn't use up the whole tick."""
+    def __init__(self, maze, relative_adjacent_coordinates:tuple[tuple]=isometric_adjacent_coordinates, max_expansions=20_000):
+        self.maze = maze
+        self.max_expansions = max_expansions
+        self.relative_adjacent_coordinates = tuple(relative_adjacent_coordinates)
+        self.actions = ((0, 0),) + self.relative_adjacent_coordinates # Waiting is always allowed
+        self.reservation_table = ReservationTable()
+        self.heuristic_tables = {}
+        self.walkable_positions = None # Set of every walkable position, built when first needed
+
+    def get_heuristic_table(self, end):
+        "Returns a dictionary of the number of steps from every reachable position to end, ignoring other agents."
+        if end not in self.heuristic_tables:
+            if self.walkable_positions is None:
+                self.walkable_positions = set(map(tuple, np.argwhere(self.maze.get_walkable_mask()).tolist()))
+            walkable_positions = self.walkable_positions
+
+            distances = {end: 0}
+            positions_to_check = deque([end])
+            while positions_to_check:
+                position = positions_to_check.popleft()
+                distance = distances[position] + 1
+                for adjacent_position in self.relative_adjacent_coordinates:
+                    # Walk the moves backwards because we are searching from the end
+                    previous_position = (position[0] - adjacent_position[0], position[1] - adjacent_position[1])
+                    if previous_position in walkable_positions and previous_position not in distances:
+                        distances[previous_position] = distance
+                        positions_to_check.append(previous_position)
+            self.heuristic_tables[end] = distances
+        return self.heuristic_tables[end]
+
+    def clear_heuristic_tables(self):
+        "Call after changing the maze."
+        self.heuristic_tables = {}
+        self.walkable_positions = None
+
+    def plan_path(self, start, end, start_time=0, time_horizon=None, reserve=True, max_expansions=None):
+        """Plan one agent with space-time A*. Returns the path or None if no collision free path was found within the time horizon
+        or within max_expansions states (self.max_expansions by default, None for no limit).
+        time_horizon is the most time steps the path may take, by default the width plus the height of the maze plus twice the distance."""
+        reservation_table = self.reservation_table
+        heuristic_table = self.get_heuristic_table(end)
+        if end not in self.walkable_positions or start not in heuristic_table or not reservation_table.is_free(start, start_time):
+            return None
+        if end in reservation_table.parked_positions: # Another agent already stays at the end forever
+            return None
+        if time_horizon is None:
+            time_horizon = self.maze.get_width() + self.maze.get_height() + heuristic_table[start] * 2
+        latest_time = start_time + time_horizon
+
+        end_free_time = reservation_table.last_reserved_time.get(end, -1) + 1
+        if end_free_time > latest_time: # The end is in use until after the time horizon
+            return None
+        if max_expansions is None:
+            max_expansions = self.max_expansions
+        expansions = 0
+
+        start_state = (start, start_time)
+        parents = {start_state: None}
+        # (f, h, tie breaker, state). Lower h first breaks ties towards the goal
+        states_to_check = [(heuristic_table[start], heuristic_table[start], 0, start_state)]
+        push_count = 1
+
+        while states_to_check:
+            _, _, _, state = heapq.heappop(states_to_check)
+            position, time = state
+            expansions += 1
+            if max_expansions is not None and expansions > max_expansions:
+                return None
+
+            if position == end and reservation_table.can_stay_forever(position, time):
+                path = []
+                while state is not None:
+                    path.append(state[0])
+                    state = parents[state]
+                path.reverse()
+                if reserve:
+                    reservation_table.reserve_path(path, start_time)
+                return path
+
+            next_time = time + 1
+            if next_time > latest_time:
                 continue
-            # for open_node in nodes_to_check_list:
-            #     if child.position == open_node.position and child.g > open_node.g:
-            #         continue
-
-            # Add the child to the nodes to check list
-            heapq.heappush(nodes_to_check_list, child)
 
-    raise Exception("Couldn't get a path to destination")
+            for adjacent_position in self.actions:
+                next_position = (position[0] + adjacent_position[0], position[1] + adjacent_position[1])
+                next_state = (next_position, next_time)
+                if next_state in parents:
+                    continue
+                h = heuristic_table.get(next_position)
+                if h is None: # Walls and positions that can't reach the end
+                    continue
+                if h < end_free_time - next_time: # Can't finish before the last agent passes through the end
+                    h = end_free_time - next_time
+                if not reservation_table.is_free(next_position, next_time) or not reservation_table.is_move_free(position, next_position, next_time):
+                    continue
+
+                parents[next_state] = state
+                heapq.heappush(states_to_check, (next_time - start_time + h, h, push_count, next_state))
+                push_count += 1
+
+        return None
+
+    def plan_paths(self, agents, start_time=0, time_horizon=None):
+        """Plan a list of (start, end) agents in priority order. Returns a list of paths with None for agents that couldn't be planned."""
+        return [self.plan_path(start, end, start_time, time_horizon) for start, end in agents]
+
+    def plan_batches(self, agents, batch_size=50, start_time=0, time_horizon=None):
+        """Plan agents a batch at a time, yielding the list of paths for each batch.
+        Useful for spreading hundreds of agents over several game ticks, every batch avoids all the batches before it."""
+        for index in range(0, len(agents), batch_size):
+            yield self.plan_paths(agents[index:index + batch_size], start_time, time_horizon)
 
 def example(print_maze = True):
 
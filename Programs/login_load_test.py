@@ -0,0 +1,167 @@
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from os.path import join
+import login_system_test
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))]
+
+def create_requests(usernames, passwords, request_count, good_ratio, bad_ratio, ip_count, attacked_user_count, attacker_ip_count, rng):
+    """Make a random list of (kind, username, password, ip) login requests.
+    good_ratio use the right password from one of ip_count normal IP addresses. bad_ratio use a wrong password and the rest use
+    unknown usernames, both from attacker_ip_count attacker IP addresses, and the bad passwords are all for attacked_user_count users,
+    so the username and IP lockouts are tripped."""
+    attacked_usernames = usernames[:attacked_user_count]
+    requests = []
+    for n in range(request_count):
+        roll = rng.random()
+        if roll < good_ratio:
+            ip_number = rng.randrange(ip_count)
+            index = rng.randrange(len(usernames))
+            requests.append(("good password", usernames[index], passwords[index], f"10.0.{ip_number // 256}.{ip_number % 256}"))
+            continue
+
+        ip = f"10.1.0.{rng.randrange(attacker_ip_count)}"
+        if roll < good_ratio + bad_ratio:
+            requests.append(("bad password", rng.choice(attacked_usernames), f"wrong-{n}", ip))
+        else:
+            requests.append(("unknown username", f"unknown-{n}", "password", ip))
+    return requests
+
+async def run_requests(service, requests, concurrency):
+    "Run the requests with concurrency simulated users. Returns a list of (request, outcome, latency in seconds)."
+    results = []
+    next_request = 0
+
+    async def simulated_user():
+        nonlocal next_request
+        while next_request < len(requests):
+            kind, username, password, ip = requests[next_request]
+            next_request += 1
+
+            start = time.perf_counter()
+            was_locked_out = login_system_test.get_lockout_remaining(username, ip) > 0
+            try:
+                if await service.authenticate(username, password, ip):
+                    outcome = "accepted"
+                else:
+                    # A right password is only rejected when a lockout started while the request was waiting for a worker
+                    outcome = "locked out" if was_locked_out or kind == "good password" else "rejected"
+            except login_system_test.LoginQueueFull:
+                outcome = "queue full"
+            results.append(((kind, username, password, ip), outcome, time.perf_counter() - start))
+
+    await asyncio.gather(*(simulated_user() for _ in range(concurrency)))
+    return results
+
+def measure_attempt_tracking_memory(results):
+    """Bytes used by fresh rate limiters after recording the failed attempts from a load test.
+    Done in a separate untimed pass, as tracemalloc slows down everything it traces."""
+    username_rate_limiter = login_system_test.username_rate_limiter
+    ip_rate_limiter = login_system_test.ip_rate_limiter
+    tracemalloc.start()
+    try:
+        memory_before = tracemalloc.get_traced_memory()[0]
+        login_system_test.username_rate_limiter = login_system_test.RateLimiter(login_system_test.MAX_ATTEMPTS, login_system_test.LOCKOUT_DURATION)
+        login_system_test.ip_rate_limiter = login_system_test.RateLimiter(login_system_test.MAX_IP_ATTEMPTS, login_system_test.IP_LOCKOUT_DURATION)
+        for (kind, username, _, ip), outcome, _ in results:
+            if outcome != "accepted":
+                login_system_test.record_failed_attempt(username, ip)
+        return tracemalloc.get_traced_memory()[0] - memory_before
+    finally:
+        tracemalloc.stop()
+        login_system_test.username_rate_limiter = username_rate_limiter
+        login_system_test.ip_rate_limiter = ip_rate_limiter
+
+def get_latency_stats(latencies):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mean": statistics.fmean(latencies) if latencies else 0,
+    }
+
+def run_load_test(user_count=200, request_count=3000, concurrency=200, good_ratio=0.5, bad_ratio=0.3, ip_count=50,
+                  attacked_user_count=5, attacker_ip_count=3, bcrypt_rounds=4, max_workers=4, max_queued=256, seed=None):
+    """Load test LoginService with many concurrent simulated users and a mix of good passwords, bad passwords and unknown usernames.
+    Bad passwords and unknown usernames come from a few attacker IP addresses and target a few users, so the lockouts are tested.
+    concurrency is below max_workers + max_queued by default, raise it to test rejecting requests when the queue is full.
+    Uses a temporary user database and fresh rate limiters, so the real users aren't touched.
+    bcrypt_rounds is low by default so creating the users is quick, use login_system_test.calibrate_bcrypt_rounds() for realistic timings.
+
+    Returns a dictionary of the results, see print_report."""
+    rng = random.Random(seed)
+    # Swapped for the test and put back afterwards
+    original_state = {name: getattr(login_system_test, name) for name in ("bcrypt_rounds", "user_db", "username_rate_limiter", "ip_rate_limiter")}
+    try:
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            login_system_test.bcrypt_rounds = bcrypt_rounds
+            login_system_test.user_db = login_system_test.UserStore(join(temporary_directory, "load_test_users.db"))
+            login_system_test.username_rate_limiter = login_system_test.RateLimiter(login_system_test.MAX_ATTEMPTS, login_system_test.LOCKOUT_DURATION)
+            login_system_test.ip_rate_limiter = login_system_test.RateLimiter(login_system_test.MAX_IP_ATTEMPTS, login_system_test.IP_LOCKOUT_DURATION)
+
+            usernames = [f"user-{n}" for n in range(user_count)]
+            passwords = [f"password-{rng.random()}" for _ in range(user_count)]
+            login_system_test.user_db.add_users(dict(zip(usernames, passwords)), max_workers=max_workers)
+
+            requests = create_requests(usernames, passwords, request_count, good_ratio, bad_ratio, ip_count, attacked_user_count, attacker_ip_count, rng)
+
+            async def run():
+                service = login_system_test.LoginService(max_workers=max_workers, max_queued=max_queued)
+                try:
+                    return await run_requests(service, requests, concurrency)
+                finally:
+                    service.close()
+
+            start = time.perf_counter()
+            results = asyncio.run(run())
+            duration = time.perf_counter() - start
+
+            login_system_test.user_db.close()
+            tracked_usernames = len(login_system_test.username_rate_limiter)
+            tracked_ips = len(login_system_test.ip_rate_limiter)
+            attempt_tracking_memory = measure_attempt_tracking_memory(results)
+    finally:
+        for name, value in original_state.items():
+            setattr(login_system_test, name, value)
+
+    latencies_by_outcome = {}
+    for (kind, _, _, _), outcome, latency in results:
+        latencies_by_outcome.setdefault((kind, outcome), []).append(latency)
+
+    return {
+        "requests": len(results),
+        "duration": duration,
+        "throughput": len(results) / duration,
+        "latency": get_latency_stats([latency for _, _, latency in results]),
+        "outcomes": {key: get_latency_stats(latencies) for key, latencies in latencies_by_outcome.items()},
+        "tracked usernames": tracked_usernames,
+        "tracked ips": tracked_ips,
+        "attempt tracking memory": attempt_tracking_memory,
+    }
+
+def format_latency(stats):
+    return (f"p50 {stats['p50'] * 1000:.1f} ms, p95 {stats['p95'] * 1000:.1f} ms, p99 {stats['p99'] * 1000:.1f} ms, "
+            f"mean {stats['mean'] * 1000:.1f} ms")
+
+def print_report(results):
+    print("== Login load test ==")
+    print(f"Requests: {results['requests']} in {results['duration']:.2f} s ({results['throughput']:.1f} per second).")
+    print(f"Latency: {format_latency(results['latency'])}.")
+    print("-- Outcomes --")
+    for (kind, outcome), stats in sorted(results["outcomes"].items()):
+        print(f"{kind.capitalize()}, {outcome}: {stats['requests']}. {format_latency(stats)}.")
+    print("-- Attempt tracking --")
+    print(f"Tracked usernames: {results['tracked usernames']}. Tracked IPs: {results['tracked ips']}.")
+    print(f"Memory: {results['attempt tracking memory'] / 1024:.1f} KiB.")
+
+if __name__ == "__main__":
+    print_report(run_load_test())
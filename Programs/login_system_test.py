@@ -1,64 +1,477 @@
 import bcrypt
 import time
 import getpass
+import asyncio
+import sqlite3
+import threading
+import secrets
+import hmac
+import hashlib
+import base64
+import heapq
+from os.path import abspath, dirname, exists, join
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from breached_password_filter import BreachedPasswordFilter
 
-# Simulated user "database"
-# bcrypt auto-generates salts when hashing
-user_db = {
-    "alice": bcrypt.hashpw("password123".encode(), bcrypt.gensalt()),
-    "bob": bcrypt.hashpw("secure456".encode(), bcrypt.gensalt())
+BCRYPT_TARGET_MS = 250 # How long a hash should take on this machine, see calibrate_bcrypt_rounds
+DEFAULT_BCRYPT_ROUNDS = 12 # bcrypt's default, calibration never goes below this
+bcrypt_rounds = DEFAULT_BCRYPT_ROUNDS # Cost factor for new hashes, see get_bcrypt_rounds
+
+def hash_password(password:bytes):
+    # bcrypt auto-generates salts when hashing
+    return bcrypt.hashpw(password, bcrypt.gensalt(bcrypt_rounds))
+
+def get_hash_rounds(password_hash:bytes):
+    "Returns the cost factor a bcrypt hash was made with, for example 12 for $2b$12$..."
+    return int(password_hash.split(b"$")[2])
+
+def calibrate_bcrypt_rounds(target_ms=BCRYPT_TARGET_MS, min_rounds=DEFAULT_BCRYPT_ROUNDS, max_rounds=16):
+    """Benchmark bcrypt on this machine and return the highest cost factor whose hash takes no longer than target_ms.
+    Each round doubles the time, so this tries costs from min_rounds upwards and stops at the first one that is too slow.
+    Never returns less than min_rounds, so a slow machine doesn't weaken the hashes."""
+    for rounds in range(min_rounds, max_rounds + 1):
+        # Fast hashes are timed a few times because they are noisy
+        repeats = 3 if rounds < 10 else 1
+        elapsed_ms = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            bcrypt.hashpw(b"calibration password", bcrypt.gensalt(rounds))
+            elapsed_ms = min(elapsed_ms, (time.perf_counter() - start) * 1000)
+
+        if elapsed_ms > target_ms:
+            return max(min_rounds, rounds - 1)
+    return max_rounds
+
+dummy_hashes = {} # Cost factor: hash of a random password, see get_dummy_hash
+
+def get_dummy_hash():
+    """A hash at the current cost to check unknown usernames against, so they take as long as real ones
+    and the time taken doesn't reveal which usernames exist."""
+    if bcrypt_rounds not in dummy_hashes:
+        dummy_hashes[bcrypt_rounds] = hash_password(secrets.token_bytes(16))
+    return dummy_hashes[bcrypt_rounds]
+
+def rehash_if_needed(username, password:bytes, password_hash:bytes):
+    """Call after a successful login. If the stored hash's cost factor is lower than bcrypt_rounds it is replaced,
+    so users move up to the calibrated cost as they log in. Hashes are never rehashed at a lower cost. Returns True if it was rehashed."""
+    if get_hash_rounds(password_hash) >= bcrypt_rounds:
+        return False
+    user_db.set_password_hash(username, hash_password(password))
+    return True
+
+class UserStore:
+    """User "database" kept on disk in SQLite, so nothing has to be hashed at startup and users aren't lost on exit.
+    Works like a read only dictionary of username to password hash. Every lookup is a query on the username index,
+    so startup takes the same time however many users there are.
+    Each thread gets its own connection, and WAL mode lets readers carry on while another thread writes."""
+    def __init__(self, path, breached_password_filter:BreachedPasswordFilter=None):
+        self.path = path
+        self.local = threading.local()
+        self.breached_password_filter = breached_password_filter # New passwords found in this are rejected
+
+    def check_password_not_breached(self, password):
+        if self.breached_password_filter is not None and password in self.breached_password_filter:
+            raise ValueError("This password has appeared in a data breach, please choose another.")
+
+    def get_connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            # The primary key is the username index, WITHOUT ROWID stores rows in that index so a lookup is a single b-tree search
+            connection.execute("CREATE TABLE IF NOT EXISTS users (username TEXT PRIMARY KEY, password_hash BLOB NOT NULL) WITHOUT ROWID")
+            connection.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID")
+            self.local.connection = connection
+        return connection
+
+    def get(self, username, default=None):
+        row = self.get_connection().execute("SELECT password_hash FROM users WHERE username = ?", (username,)).fetchone()
+        return row[0] if row is not None else default
+
+    def __getitem__(self, username):
+        password_hash = self.get(username)
+        if password_hash is None:
+            raise KeyError(username)
+        return password_hash
+
+    def __contains__(self, username):
+        return self.get(username) is not None
+
+    def __len__(self):
+        return self.get_connection().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def set_password_hash(self, username, password_hash):
+        with self.get_connection() as connection:
+            connection.execute("INSERT OR REPLACE INTO users (username, password_hash) VALUES (?, ?)", (username, password_hash))
+
+    def get_setting(self, name, default=None):
+        row = self.get_connection().execute("SELECT value FROM settings WHERE name = ?", (name,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_setting(self, name, value):
+        with self.get_connection() as connection:
+            connection.execute("INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)", (name, str(value)))
+
+    def add_user(self, username, password):
+        self.check_password_not_breached(password)
+        self.set_password_hash(username, hash_password(password.encode()))
+
+    def add_users(self, users:dict, overwrite=False, max_workers=None):
+        """Bulk import a dictionary of username to password. Passwords are hashed in parallel threads (bcrypt releases the GIL)
+        and saved in one transaction. Existing users are skipped unless overwrite is True.
+        Raises ValueError without adding anyone if any password is breached.
+        Returns the number of users added."""
+        if not overwrite:
+            users = {username: password for username, password in users.items() if username not in self}
+        if not users:
+            return 0
+
+        if self.breached_password_filter is not None:
+            breached_usernames = [username for username, password in users.items() if password in self.breached_password_filter]
+            if breached_usernames:
+                raise ValueError(f"These users have passwords which have appeared in a data breach: {', '.join(breached_usernames)}.")
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            password_hashes = executor.map(lambda password: hash_password(password.encode()), users.values())
+            rows = list(zip(users.keys(), password_hashes))
+
+        with self.get_connection() as connection:
+            connection.executemany("INSERT OR REPLACE INTO users (username, password_hash) VALUES (?, ?)", rows)
+        return len(rows)
+
+    def close(self):
+        "Close this thread's connection."
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+USER_DB_PATH = join(dirname(abspath(__file__)), "login_users.db")
+BREACHED_PASSWORD_FILTER_PATH = join(dirname(abspath(__file__)), "breached_passwords.bloom") # Build with BreachedPasswordFilter.build
+DEFAULT_USERS = {
+    "alice": "password123",
+    "bob": "secure456"
 }
 
-# Track login attempts and lockout time
-login_attempts = {}
+user_db = UserStore(USER_DB_PATH)
+
+def get_bcrypt_rounds(store:UserStore, recalibrate=False):
+    """Returns the cost factor saved in the store, calibrating and saving it the first time (or if recalibrate is True).
+    Saving it means startup doesn't take a second benchmarking bcrypt, and noise can't change the cost between runs."""
+    rounds = None if recalibrate else store.get_setting("bcrypt_rounds")
+    if rounds is None:
+        rounds = calibrate_bcrypt_rounds()
+        store.set_setting("bcrypt_rounds", rounds)
+    return max(DEFAULT_BCRYPT_ROUNDS, int(rounds))
+
+class RateLimiter:
+    """Sliding window rate limiter. A key (a username or an IP address) is locked out once it has max_attempts failed attempts
+    within window seconds, until the oldest of those attempts is more than window seconds old.
+
+    Memory is bounded: only the last max_attempts times are kept per key, keys expire once their newest attempt leaves the window,
+    and at most max_keys keys are kept, evicting the least recently used. Keys are split over shards which each have their own lock,
+    so concurrent callers rarely wait for each other."""
+    def __init__(self, max_attempts, window, max_keys=100_000, shard_count=16):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.max_keys_per_shard = max(1, max_keys // shard_count)
+        # Each shard is a lock and an OrderedDict of key: deque of attempt times, least recently updated first
+        self.shards = [(threading.Lock(), OrderedDict()) for _ in range(shard_count)]
+
+    def get_shard(self, key):
+        return self.shards[hash(key) % len(self.shards)]
+
+    def expire_old_keys(self, attempts, now):
+        "Remove keys with no attempts in the window. The least recently updated keys are at the front, so stop at the first recent one."
+        while attempts:
+            key, times = next(iter(attempts.items()))
+            if now - times[-1] < self.window:
+                break
+            del attempts[key]
+
+    def record(self, key, now=None):
+        "Record a failed attempt. Returns its time, which can be passed to undo."
+        now = time.time() if now is None else now
+        lock, attempts = self.get_shard(key)
+        with lock:
+            times = attempts.get(key)
+            if times is None:
+                times = attempts[key] = deque(maxlen=self.max_attempts)
+            else:
+                attempts.move_to_end(key)
+            times.append(now)
+
+            self.expire_old_keys(attempts, now)
+            while len(attempts) > self.max_keys_per_shard:
+                attempts.popitem(last=False)
+        return now
+
+    def undo(self, key, attempt_time):
+        "Remove an attempt recorded at attempt_time, for example one recorded before a check that then succeeded."
+        lock, attempts = self.get_shard(key)
+        with lock:
+            times = attempts.get(key)
+            if times is not None and attempt_time in times:
+                times.remove(attempt_time)
+                if not times:
+                    del attempts[key] # expire_old_keys expects every key to have an attempt
+
+    def get_remaining(self, key, now=None):
+        "Returns the number of seconds until the key can try again, or 0 if it isn't locked out."
+        now = time.time() if now is None else now
+        lock, attempts = self.get_shard(key)
+        with lock:
+            times = attempts.get(key)
+            if times is None or len(times) < self.max_attempts:
+                return 0
+            return max(0, times[0] + self.window - now)
+
+    def reset(self, key):
+        lock, attempts = self.get_shard(key)
+        with lock:
+            attempts.pop(key, None)
+
+    def __len__(self):
+        return sum(len(attempts) for _, attempts in self.shards)
+
 MAX_ATTEMPTS = 3
 LOCKOUT_DURATION = 30  # seconds
+MAX_IP_ATTEMPTS = 20 # Per IP address, across every username
+IP_LOCKOUT_DURATION = 60  # seconds
 
-def is_locked_out(username):
-    entry = login_attempts.get(username)
-    if not entry:
-        return False
+# Track failed login attempts
+username_rate_limiter = RateLimiter(MAX_ATTEMPTS, LOCKOUT_DURATION)
+ip_rate_limiter = RateLimiter(MAX_IP_ATTEMPTS, IP_LOCKOUT_DURATION)
 
-    attempts, last_attempt = entry
-    if attempts >= MAX_ATTEMPTS:
-        elapsed = time.time() - last_attempt
-        if elapsed < LOCKOUT_DURATION:
-            remaining = int(LOCKOUT_DURATION - elapsed)
-            print(f"Too many failed attempts. Try again in {remaining} seconds.")
-            return True
-        else:
-            # Reset on timeout
-            login_attempts[username] = [0, time.time()]
-            return False
+def get_lockout_remaining(username, ip=None):
+    "Returns the number of seconds until the user (or IP address) can try again, or 0 if they aren't locked out."
+    remaining = username_rate_limiter.get_remaining(username)
+    if ip is not None:
+        remaining = max(remaining, ip_rate_limiter.get_remaining(ip))
+    return remaining
+
+def is_locked_out(username, ip=None):
+    remaining = get_lockout_remaining(username, ip)
+    if remaining > 0:
+        print(f"Too many failed attempts. Try again in {int(remaining)} seconds.")
+        return True
     return False
 
-def record_failed_attempt(username):
-    if username not in login_attempts:
-        login_attempts[username] = [1, time.time()]
-    else:
-        login_attempts[username][0] += 1
-        login_attempts[username][1] = time.time()
+def record_failed_attempt(username, ip=None):
+    """Record a failed attempt for the username and IP address.
+    Pass None as the username to count the attempt only against the IP address.
+    Returns the attempt's time, see undo_failed_attempt."""
+    attempt_time = time.time()
+    if username is not None:
+        username_rate_limiter.record(username, attempt_time)
+    if ip is not None:
+        ip_rate_limiter.record(ip, attempt_time)
+    return attempt_time
+
+def undo_failed_attempt(username, ip, attempt_time):
+    "Remove an attempt recorded by record_failed_attempt, for when it was recorded before the password turned out to be correct."
+    if username is not None:
+        username_rate_limiter.undo(username, attempt_time)
+    if ip is not None:
+        ip_rate_limiter.undo(ip, attempt_time)
+
+def record_successful_login(username):
+    username_rate_limiter.reset(username)
+
+SESSION_LIFETIME = 60 * 60 # seconds
+
+class SessionTokens:
+    """Issues and checks HMAC signed session tokens, so requests after logging in don't need another bcrypt check.
+    A token looks like payload.signature, where the payload holds the username, expiry time and a random token id.
+    Checking one is a single SHA-256 HMAC, which takes microseconds.
+
+    Revoked token ids are kept until their token would expire anyway. At most max_revoked are stored,
+    if more are needed the secret is replaced, which signs out everyone instead of letting a revoked token work again."""
+    def __init__(self, secret:bytes=None, lifetime=SESSION_LIFETIME, max_revoked=100_000):
+        self.secret = secret if secret is not None else secrets.token_bytes(32) # A new secret signs out everyone
+        self.lifetime = lifetime
+        self.max_revoked = max_revoked
+        self.revoked = {} # Token id: expiry time
+        self.revoked_expiry_heap = [] # (expiry time, token id)
+        self.lock = threading.Lock()
+
+    def sign(self, payload:bytes):
+        return base64.urlsafe_b64encode(hmac.new(self.secret, payload, hashlib.sha256).digest()).rstrip(b"=")
+
+    def issue(self, username, now=None):
+        now = time.time() if now is None else now
+        payload = f"{username}:{int(now + self.lifetime)}:{secrets.token_urlsafe(12)}".encode()
+        payload = base64.urlsafe_b64encode(payload).rstrip(b"=")
+        return (payload + b"." + self.sign(payload)).decode()
+
+    def read(self, token, now=None):
+        "Returns (username, expiry time, token id) if the token is correctly signed and hasn't expired, otherwise None."
+        now = time.time() if now is None else now
+        if not isinstance(token, str):
+            return None
+        try:
+            payload, signature = token.encode().split(b".")
+            if not hmac.compare_digest(signature, self.sign(payload)):
+                return None
+            payload = base64.urlsafe_b64decode(payload + b"=" * (-len(payload) % 4)).decode()
+            username, expiry, token_id = payload.rsplit(":", 2) # Split from the right in case the username has a colon
+            expiry = int(expiry)
+        except (ValueError, UnicodeError):
+            return None
+
+        if expiry <= now:
+            return None
+        return username, expiry, token_id
+
+    def verify(self, token, now=None):
+        "Returns the username if the token is valid and not revoked, otherwise None."
+        token_data = self.read(token, now)
+        if token_data is None or token_data[2] in self.revoked:
+            return None
+        return token_data[0]
+
+    def revoke(self, token, now=None):
+        "Revoke a token, for example when logging out. Returns False if the token was already invalid."
+        now = time.time() if now is None else now
+        token_data = self.read(token, now)
+        if token_data is None:
+            return False
+
+        _, expiry, token_id = token_data
+        with self.lock:
+            self.revoked[token_id] = expiry
+            heapq.heappush(self.revoked_expiry_heap, (expiry, token_id))
+
+            # Revocations of expired tokens aren't needed any more
+            while self.revoked_expiry_heap and self.revoked_expiry_heap[0][0] <= now:
+                _, old_token_id = heapq.heappop(self.revoked_expiry_heap)
+                self.revoked.pop(old_token_id, None)
+
+            if len(self.revoked) > self.max_revoked:
+                # Forgetting a revocation would make that token valid again, so invalidate every token instead
+                self.secret = secrets.token_bytes(32)
+                self.revoked.clear()
+                self.revoked_expiry_heap.clear()
+        return True
+
+session_tokens = SessionTokens()
 
 def login():
+    """Asks for a username and password. Returns a session token if they are correct, otherwise None."""
     print("=== Secure Login System ===")
     username = input("Username: ").strip()
 
-    if username not in user_db:
-        print("Invalid username or password.")
-        return
-
     if is_locked_out(username):
         return
 
     password = getpass.getpass("Password: ").encode()
 
-    if bcrypt.checkpw(password, user_db[username]):
+    password_hash = user_db.get(username)
+    if password_hash is None:
+        bcrypt.checkpw(password, get_dummy_hash()) # Takes as long as a real user
+        print("Invalid username or password.")
+        record_failed_attempt(username)
+        return
+
+    if bcrypt.checkpw(password, password_hash):
         print(f"Hello, {username}!")
-        if username in login_attempts:
-            del login_attempts[username]  # Reset on success
+        record_successful_login(username)
+        rehash_if_needed(username, password, password_hash)
+        return session_tokens.issue(username)
     else:
         print("Invalid username or password.")
         record_failed_attempt(username)
 
+class LoginQueueFull(Exception):
+    "Raised when the login service already has too many requests waiting."
+
+class LoginService:
+    """Asyncio login service which runs bcrypt in a bounded thread pool so checks run concurrently (bcrypt releases the GIL).
+
+    At most max_workers hashes run at once and at most max_queued more wait for a worker.
+    Any more requests are rejected straight away with LoginQueueFull so a burst can't build up an unbounded backlog.
+
+    Example
+    >>> user_db.add_users(DEFAULT_USERS)
+    >>> service = LoginService()
+    >>> asyncio.run(service.authenticate("alice", "password123"))
+    True
+    """
+    def __init__(self, max_workers=4, max_queued=64):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self.semaphore = asyncio.Semaphore(max_workers)
+        self.pending = 0 # Requests running or waiting for a worker
+
+    @asynccontextmanager
+    async def worker_slot(self):
+        "Wait for a free worker, or raise LoginQueueFull if too many requests are already waiting."
+        if self.pending >= self.max_workers + self.max_queued:
+            raise LoginQueueFull("Too many login requests, try again later.")
+
+        self.pending += 1
+        try:
+            async with self.semaphore:
+                yield
+        finally:
+            self.pending -= 1
+
+    async def run_in_pool(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def authenticate(self, username, password, ip=None):
+        """Returns True if the username and password are correct. Failed attempts count towards the lockout the same as login(),
+        and towards the IP address's limit if ip is given."""
+        if ip is not None and ip_rate_limiter.get_remaining(ip) > 0:
+            return False
+
+        async with self.worker_slot():
+            # Checked once a worker is free, and the attempt is counted before hashing (with no await in between),
+            # so a burst of concurrent guesses can't get more than MAX_ATTEMPTS past the lockout
+            if get_lockout_remaining(username, ip) > 0:
+                return False
+            attempt_time = record_failed_attempt(username, ip)
+
+            password_hash = user_db.get(username)
+            if password_hash is None:
+                # Unknown usernames are hashed and locked out like real ones, so neither the time nor the lockout reveals which exist
+                await self.run_in_pool(bcrypt.checkpw, password.encode(), get_dummy_hash())
+                return False
+
+            if await self.run_in_pool(bcrypt.checkpw, password.encode(), password_hash):
+                undo_failed_attempt(username, ip, attempt_time)
+                record_successful_login(username)
+                await self.run_in_pool(rehash_if_needed, username, password.encode(), password_hash)
+                return True
+            return False
+
+    async def login(self, username, password, ip=None):
+        "Same as authenticate but returns a session token if the password is correct, otherwise None."
+        if await self.authenticate(username, password, ip):
+            return session_tokens.issue(username)
+        return None
+
+    def authenticate_session(self, token):
+        "Returns the username for a valid session token, otherwise None. No bcrypt check is needed so this doesn't use the thread pool."
+        return session_tokens.verify(token)
+
+    def logout(self, token):
+        return session_tokens.revoke(token)
+
+    async def hash_password(self, password):
+        async with self.worker_slot():
+            return await self.run_in_pool(hash_password, password.encode())
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
 if __name__ == "__main__":
+    bcrypt_rounds = get_bcrypt_rounds(user_db)
+    user_db.add_users(DEFAULT_USERS) # Only hashes users which aren't saved yet
+    if exists(BREACHED_PASSWORD_FILTER_PATH):
+        user_db.breached_password_filter = BreachedPasswordFilter.open(BREACHED_PASSWORD_FILTER_PATH)
     login()
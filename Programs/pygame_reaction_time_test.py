@@ -1,7 +1,12 @@
 import pygame
 import statistics
+import sys
 from sys import exit
 from random import randint
+from os.path import abspath, dirname, join
+
+sys.path.append(join(dirname(abspath(__file__)), "..", "SimpleTools"))
+from text_render_cache import render_text_line # Shared with pygame_simple_base
 
 copying_enabled = True # Change to False if you don't want to use pyperclip
 if copying_enabled: from pyperclip import copy
@@ -81,7 +86,7 @@ def draw_text(pos, text="Text", colour=COLORS["white"], font=FONTS["basic"], lin
 
     lines = text.split("\n")
     for line in lines:
-        text_surface = font.render(line, True, colour)
+        text_surface = render_text_line(font, line, colour)
         text_rect = text_surface.get_rect(topleft=pos)
         surface.blit(text_surface, text_rect)
         pos[1] += text_surface.get_height() + line_spacing
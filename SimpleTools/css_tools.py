@@ -1,5 +1,14 @@
 import re
 import random
+import json
+import os
+from html.parser import HTMLParser
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError: # Palette needs it, the random style generators fall back to random without it
+    np = None
 
 def format_color_data(colors, mode=1):
     """Turn object color data into a dictionary
@@ -30,8 +39,217 @@ def format_color_data(colors, mode=1):
     
     return output
 
-def element_name_list_to_css(element_name_list = "h1, h2, div, a, body", from_string=False):
-    """Convert a list of element names to empty css style definers
+COLOR_SPACES = ("hex", "rgb", "hsl", "hsb", "cmyk", "lab")
+
+# sRGB (D65) to CIE XYZ
+RGB_TO_XYZ = np.array([[0.4124564, 0.3575761, 0.1804375],
+                       [0.2126729, 0.7151522, 0.0721750],
+                       [0.0193339, 0.1191920, 0.9503041]]) if np is not None else None
+D65_WHITE = np.array([0.95047, 1.0, 1.08883]) if np is not None else None
+
+def hue_to_rgb(hue, chroma, lightness_offset):
+    "Shared last step of HSL and HSB to RGB. hue is in degrees, chroma and lightness_offset are from 0 to 1. Returns RGB from 0 to 255."
+    hue_sector = (hue % 360) / 60
+    second_largest = chroma * (1 - np.abs(hue_sector % 2 - 1))
+    zeros = np.zeros_like(chroma)
+    sector = np.floor(hue_sector).astype(int)[:, None]
+    rgb = np.select(
+        [sector == 0, sector == 1, sector == 2, sector == 3, sector == 4],
+        [np.stack((chroma, second_largest, zeros), axis=1), np.stack((second_largest, chroma, zeros), axis=1),
+         np.stack((zeros, chroma, second_largest), axis=1), np.stack((zeros, second_largest, chroma), axis=1),
+         np.stack((second_largest, zeros, chroma), axis=1)],
+        np.stack((chroma, zeros, second_largest), axis=1))
+    return (rgb + lightness_offset[:, None]) * 255
+
+class Palette:
+    """A list of named colours held as one NumPy array of RGB values, so big palettes are converted all at once.
+    Converts between hex, RGB, HSL, HSB, CMYK and Lab (using the same units as format_color_data's colour data)
+    and writes CSS variables, a Python dictionary or JSON.
+
+    Example
+    >>> palette = Palette.from_colors([{"name": "Oxford Blue", "hex": "011936"}, {"name": "Charcoal", "hex": "465362"}])
+    >>> print(palette.to_css_variables())
+    :root {
+        --oxford-blue: #011936;
+        --charcoal: #465362;
+    }
+    >>> palette.format_values("hsl", decimals=1)
+    [[212.8, 96.4, 10.8], [212.1, 16.7, 32.9]]
+    """
+    def __init__(self, names, rgb):
+        if np is None:
+            raise ImportError("Palette needs NumPy.")
+        self.names = list(names)
+        self.rgb = np.asarray(rgb, dtype=float).reshape(-1, 3) # From 0 to 255
+
+    @classmethod
+    def from_hex(cls, hex_colors, names=None):
+        "Make a palette from hex strings like \"#011936\" or \"011936\". Every string is decoded in one NumPy operation."
+        hex_colors = [hex_color.lstrip("#") for hex_color in hex_colors]
+        hex_colors = [hex_color if len(hex_color) != 3 else "".join(character * 2 for character in hex_color) for hex_color in hex_colors]
+        if any(len(hex_color) != 6 for hex_color in hex_colors):
+            raise ValueError("Hex colours must have 3 or 6 digits.")
+
+        digits = np.frombuffer("".join(hex_colors).lower().encode("ascii"), dtype=np.uint8).reshape(-1, 6).astype(int)
+        digits = np.where(digits >= ord("a"), digits - ord("a") + 10, digits - ord("0"))
+        if ((digits < 0) | (digits > 15)).any():
+            raise ValueError("Hex colours can only contain 0-9 and a-f.")
+        rgb = digits[:, 0::2] * 16 + digits[:, 1::2]
+        return cls(names if names is not None else hex_colors, rgb)
+
+    @classmethod
+    def from_values(cls, values, color_space, names):
+        "Make a palette from an (n, 3) array (or (n, 4) for CMYK) in any colour space except hex."
+        return cls(names, convert_to_rgb(np.asarray(values, dtype=float), color_space))
+
+    @classmethod
+    def from_colors(cls, colors):
+        "Make a palette from colour data like format_color_data takes. Uses each colour's \"hex\" value if it has one, otherwise \"rgb\"."
+        names = [color["name"] for color in colors]
+        if all("hex" in color for color in colors):
+            return cls.from_hex([color["hex"] for color in colors], names)
+        return cls(names, [color["rgb"] for color in colors])
+
+    def __len__(self):
+        return len(self.names)
+
+    def convert(self, color_space):
+        "Returns the colours in color_space as an array, or a list of strings for hex."
+        return convert_from_rgb(self.rgb, color_space)
+
+    def format_values(self, color_space, decimals=0):
+        "Returns a list of value lists (or hex strings) rounded to decimals places."
+        values = self.convert(color_space)
+        if color_space == "hex":
+            return values
+        values = np.round(values, decimals)
+        return (values.astype(int) if decimals == 0 else values).tolist()
+
+    def to_css_variables(self, color_space="hex", selector=":root"):
+        "Returns a CSS rule defining a variable for every colour, in hex, rgb, hsl or lab."
+        values = self.format_values(color_space)
+        if color_space == "hex":
+            css_values = ["#" + value for value in values]
+        elif color_space == "rgb":
+            css_values = [f"rgb({r}, {g}, {b})" for r, g, b in values]
+        elif color_space == "hsl":
+            css_values = [f"hsl({h}, {s}%, {l}%)" for h, s, l in values]
+        elif color_space == "lab":
+            css_values = [f"lab({l}% {a} {b})" for l, a, b in values]
+        else:
+            raise ValueError(f"CSS has no {color_space} colours, use hex, rgb, hsl or lab.")
+
+        variable_names = ["-".join(name.split()).lower() for name in self.names]
+        lines = [f"    --{variable_name}: {css_value};" for variable_name, css_value in zip(variable_names, css_values)]
+        return selector + " {\n" + "\n".join(lines) + "\n}\n"
+
+    def to_python_dict(self, color_space="rgb"):
+        "Returns the text of a Python dictionary of names to colour values, like format_color_data(colors, mode=2)."
+        lines = [f'   "{name.replace(" ", "_").lower()}": {tuple(value) if color_space != "hex" else repr(value)}, ' for name, value in zip(self.names, self.format_values(color_space))]
+        return "{\n" + "\n".join(lines) + "\n}\n"
+
+    def to_json(self, color_spaces=COLOR_SPACES, indent=None):
+        """Returns a JSON list of colour objects, with the same keys as format_color_data's colour data.
+        Without indent the text is filled in directly from the formatted values, which is several times faster than json.dumps for big palettes."""
+        if indent is not None:
+            columns = [self.format_values(color_space) for color_space in color_spaces]
+            colors = [{"name": name, **dict(zip(color_spaces, values))} for name, *values in zip(self.names, *columns)]
+            return json.dumps(colors, indent=indent)
+        if len(self) == 0:
+            return "[]"
+
+        # Fill one %-format template for every colour at once, instead of building a dictionary per colour for json.dumps
+        row_template = ['{"name": %s']
+        cells = [np.array([json.dumps(name) for name in self.names], dtype=object)[:, None]]
+        for color_space in color_spaces:
+            if color_space == "hex":
+                row_template.append(f'"{color_space}": "%s"') # Hex strings never need escaping
+                cells.append(np.array(self.convert(color_space), dtype=object)[:, None])
+            else:
+                values = np.round(self.convert(color_space)).astype(int) # Same as format_values
+                row_template.append(f'"{color_space}": [' + ", ".join(["%d"] * values.shape[1]) + "]")
+                cells.append(values.astype(object))
+        row_template = ", ".join(row_template) + "}"
+        return "[" + ", ".join([row_template] * len(self)) % tuple(np.concatenate(cells, axis=1).ravel().tolist()) + "]"
+
+def convert_from_rgb(rgb, color_space):
+    "Convert an (n, 3) array of RGB values from 0 to 255 to color_space. Hex gives a list of strings."
+    if color_space == "rgb":
+        return rgb.copy()
+    if color_space == "hex":
+        rgb = np.clip(np.round(rgb), 0, 255).astype(np.uint8)
+        # Look up the ASCII digit for each half byte, then read every row of 6 digits as one string
+        hex_digits = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+        characters = np.empty((len(rgb), 6), dtype=np.uint8)
+        characters[:, 0::2] = hex_digits[rgb >> 4]
+        characters[:, 1::2] = hex_digits[rgb & 15]
+        return characters.view("S6").ravel().astype("U6").tolist()
+
+    scaled = rgb / 255
+    largest = scaled.max(axis=1)
+    smallest = scaled.min(axis=1)
+    chroma = largest - smallest
+
+    if color_space in ("hsl", "hsb"):
+        r, g, b = scaled.T
+        safe_chroma = np.where(chroma == 0, 1, chroma)
+        hue = np.select([chroma == 0, largest == r, largest == g],
+                        [0, ((g - b) / safe_chroma) % 6, (b - r) / safe_chroma + 2],
+                        (r - g) / safe_chroma + 4) * 60
+        if color_space == "hsl":
+            lightness = (largest + smallest) / 2
+            saturation_divisor = 1 - np.abs(2 * lightness - 1)
+            saturation = np.where(saturation_divisor == 0, 0, chroma / np.where(saturation_divisor == 0, 1, saturation_divisor))
+            return np.stack((hue, saturation * 100, lightness * 100), axis=1)
+        saturation = np.where(largest == 0, 0, chroma / np.where(largest == 0, 1, largest))
+        return np.stack((hue, saturation * 100, largest * 100), axis=1)
+
+    if color_space == "cmyk":
+        black = 1 - largest
+        white_part = np.where(black == 1, 1, 1 - black)
+        cmy = np.where((black == 1)[:, None], 0, (1 - scaled - black[:, None]) / white_part[:, None])
+        return np.concatenate((cmy, black[:, None]), axis=1) * 100
+
+    if color_space == "lab":
+        linear = np.where(scaled <= 0.04045, scaled / 12.92, ((scaled + 0.055) / 1.055) ** 2.4)
+        xyz = linear @ RGB_TO_XYZ.T / D65_WHITE
+        delta = 6 / 29
+        f = np.where(xyz > delta ** 3, np.cbrt(xyz), xyz / (3 * delta ** 2) + 4 / 29)
+        return np.stack((116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])), axis=1)
+
+    raise ValueError(f"Unknown colour space {color_space!r}, use one of {COLOR_SPACES}.")
+
+def convert_to_rgb(values, color_space):
+    "Convert an array of color_space values (not hex, see Palette.from_hex) to RGB values from 0 to 255."
+    if color_space == "rgb":
+        return values.copy()
+
+    if color_space == "hsl":
+        hue, saturation, lightness = values.T / np.array([[1], [100], [100]])
+        chroma = (1 - np.abs(2 * lightness - 1)) * saturation
+        return hue_to_rgb(hue, chroma, lightness - chroma / 2)
+
+    if color_space == "hsb":
+        hue, saturation, brightness = values.T / np.array([[1], [100], [100]])
+        chroma = brightness * saturation
+        return hue_to_rgb(hue, chroma, brightness - chroma)
+
+    if color_space == "cmyk":
+        cmyk = values / 100
+        return 255 * (1 - cmyk[:, :3]) * (1 - cmyk[:, 3:])
+
+    if color_space == "lab":
+        fy = (values[:, 0] + 16) / 116
+        f = np.stack((fy + values[:, 1] / 500, fy, fy - values[:, 2] / 200), axis=1)
+        delta = 6 / 29
+        xyz = np.where(f > delta, f ** 3, 3 * delta ** 2 * (f - 4 / 29)) * D65_WHITE
+        linear = np.clip(xyz @ np.linalg.inv(RGB_TO_XYZ).T, 0, 1)
+        return np.where(linear <= 0.0031308, linear * 12.92, 1.055 * linear ** (1 / 2.4) - 0.055) * 255
+
+    raise ValueError(f"Unknown colour space {color_space!r}, use one of {COLOR_SPACES}.")
+
+def element_name_list_to_css(element_name_list = "h1, h2, div, a, body", from_string=False, print_output=True):
+    """Convert a list of element names to empty css style definers. Prints them if print_output is True and returns them.
 
     For example: .header .blog-title div
     
@@ -49,55 +267,131 @@ def element_name_list_to_css(element_name_list = "h1, h2, div, a, body", from_st
     if from_string:
         element_name_list = element_name_list.split()
 
-    for element_name in element_name_list:
-        print(element_name + " {\n\n}")
+    output = "".join(element_name + " {\n\n}\n" for element_name in element_name_list)
+    if print_output:
+        print(output, end="")
+    return output
+
+class SelectorCollector(HTMLParser):
+    "HTML parser which collects every tag name, class and id it sees."
+    def __init__(self):
+        super().__init__()
+        self.tags = set()
+        self.classes = set()
+        self.ids = set()
+
+    def handle_starttag(self, tag, attrs):
+        self.tags.add(tag)
+        for name, value in attrs:
+            if name == "class" and value:
+                self.classes.update(value.split())
+            elif name == "id" and value:
+                self.ids.add(value.strip())
+
+def scan_html_files(file_names, chunk_size=64 * 1024):
+    """Collect the tags, classes and ids used in a list of HTML files. Each file is fed to the parser in chunks.
+    Returns (tags, classes, ids) sets."""
+    collector = SelectorCollector()
+    for file_name in file_names:
+        with open(file_name, "r", encoding="utf-8", errors="replace") as opened_file:
+            while chunk := opened_file.read(chunk_size):
+                collector.feed(chunk)
+        collector.close()
+        collector.reset() # Ready for the next file, the sets are kept
+    return collector.tags, collector.classes, collector.ids
+
+def scan_html_directory(directory, processes=None, extensions=(".html", ".htm"), files_per_task=64):
+    """Collect the distinct tags, classes and ids used by every HTML file in a directory (and its subdirectories).
+    Files are parsed in a process pool, files_per_task at a time so each worker sends back one set per batch instead of per file.
+    Returns a dictionary of "tags", "classes" and "ids" sets."""
+    file_names = [os.path.join(root, file_name) for root, _, file_names in os.walk(directory) for file_name in file_names if file_name.lower().endswith(extensions)]
+    batches = [file_names[index:index + files_per_task] for index in range(0, len(file_names), files_per_task)]
+
+    if processes == 1 or len(batches) <= 1:
+        return merge_selectors(map(scan_html_files, batches))
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return merge_selectors(executor.map(scan_html_files, batches))
+
+def merge_selectors(results):
+    "Combine (tags, classes, ids) results into one dictionary of sets."
+    selectors = {"tags": set(), "classes": set(), "ids": set()}
+    for tags, classes, ids in results:
+        selectors["tags"] |= tags
+        selectors["classes"] |= classes
+        selectors["ids"] |= ids
+    return selectors
+
+def escape_css_identifier(name):
+    "Escape characters which aren't allowed in a CSS class or id selector, for example md:flex becomes md\\:flex."
+    name = re.sub(r"([^\w-])", r"\\\1", name)
+    if name[:1].isdigit():
+        name = f"\\{ord(name[0]):x} " + name[1:]
+    return name
+
+def html_directory_to_css(directory, processes=None, print_output=False):
+    """Scan every HTML file in a directory with scan_html_directory and make a skeleton stylesheet with an empty rule
+    for every tag, class and id used, using element_name_list_to_css."""
+    selectors = scan_html_directory(directory, processes)
+    element_names = sorted(selectors["tags"])
+    element_names += ["." + escape_css_identifier(class_name) for class_name in sorted(selectors["classes"])]
+    element_names += ["#" + escape_css_identifier(element_id) for element_id in sorted(selectors["ids"])]
+    return element_name_list_to_css(element_names, print_output=print_output)
 
 #TEXT URLS: @import url('https://fonts.googleapis.com/css?family=Baloo');
 
-def generate_random_css_style(font_family = "Times New Roman", previous = ""):
-    """Generate a random css style with previous (arg) before every line"""
-    # generate random RGB color
-    r, g, b = random.sample(range(256), 3)
-    rgb_color1 = f"rgb({r}, {g}, {b})"
-    
-    r, g, b = random.sample(range(256), 3)
-    rgb_color2 = f"rgb({r}, {g}, {b})"
-    
-    r, g, b = random.sample(range(256), 3)
-    rgb_color3 = f"rgb({r}, {g}, {b})"
-    
-    # generate random number between 5 and 100
-    nums = random.sample(range(5, 255), 15)
-    
-    output = f"""font-size: {nums[0]}px;
-font-family: "Times New Roman";
-background: {rgb_color1};
-color: {rgb_color2};
-width: {nums[1]}px;
-height: {nums[2]}px;
-line-height: {nums[3]}px;
+CSS_STYLE_TEMPLATE = """font-size: {0}px;
+font-family: "{font_family}";
+background: rgb({11}, {12}, {13});
+color: rgb({14}, {15}, {16});
+width: {1}px;
+height: {2}px;
+line-height: {3}px;
 border-style: solid;
-border-width: {nums[4]}px;
+border-width: {4}px;
 text-align: center;
-border-color: {rgb_color3};
-padding: {nums[5]}px {nums[6]}px {nums[7]}px {nums[8]}px;
-margin: {nums[9]}px {nums[1]}px {nums[2]}px {nums[3]}px;
-border-radius: {nums[10]}px;
-text-decoration: underline;\n"""
-    
+border-color: rgb({17}, {18}, {19});
+padding: {5}px {6}px {7}px {8}px;
+margin: {9}px {1}px {2}px {3}px;
+border-radius: {10}px;
+text-decoration: underline;
+"""
+
+def generate_random_css_style(font_family = "Times New Roman", previous = ""):
+    """Generate a random css style with previous (arg) before every line"""
+    # generate random number between 5 and 255, then three random RGB colors
+    nums = random.sample(range(5, 255), 11)
+    for _ in range(3):
+        nums += random.sample(range(256), 3)
+
+    output = CSS_STYLE_TEMPLATE.format(*nums, font_family=font_family)
+
     if previous != "":
-        output_with_previous = ""
-        for line in output.splitlines():
-            output_with_previous += previous + line + "\n"
+        output = "".join(previous + line + "\n" for line in output.splitlines())
 
-        output = output_with_previous
-    
     return output
 
-def generate_multiple_random_css_styles(style_number = int(input("How many styles? > "))):
-    "Generate multiple css styles and format them"
-    output = ""
-    for n in range(style_number):
-        output += f"style-{n+1} {"{"}\n" + generate_random_css_style(previous="    ") + "}\n"
-    
-    return output
\ No newline at end of file
+def generate_multiple_random_css_styles(style_number = None):
+    "Generate multiple css styles and format them. Asks how many styles if style_number isn't given."
+    if style_number is None:
+        style_number = int(input("How many styles? > "))
+
+    return "".join(f"style-{n+1} {{\n" + generate_random_css_style(previous="    ") + "}\n" for n in range(style_number))
+
+def write_random_css_styles(file_name, style_number, seed=None, batch_size=10_000, font_family = "Times New Roman"):
+    """Write style_number random css styles, formatted like generate_multiple_random_css_styles, straight to a file.
+    The random numbers for a whole batch of styles are drawn at once (with NumPy if it is installed).
+    The same seed always writes the same file.
+    Unlike generate_random_css_style, numbers within one style can repeat."""
+    # One style, with every line indented and the numbers as format fields
+    style_template = "style-{style_number} {{\n" + "".join("    " + line + "\n" for line in CSS_STYLE_TEMPLATE.replace("{font_family}", font_family.replace("{", "{{").replace("}", "}}")).splitlines()) + "}}\n"
+    random_generator = np.random.default_rng(seed) if np is not None else random.Random(seed)
+
+    with open(file_name, "w") as opened_file:
+        for start in range(0, style_number, batch_size):
+            count = min(batch_size, style_number - start)
+            if np is not None:
+                nums = np.concatenate((random_generator.integers(5, 255, size=(count, 11)), random_generator.integers(0, 256, size=(count, 9))), axis=1).tolist()
+            else:
+                nums = [[random_generator.randrange(5, 255) for _ in range(11)] + [random_generator.randrange(256) for _ in range(9)] for _ in range(count)]
+
+            opened_file.write("".join(style_template.format(*row, style_number=start + index + 1) for index, row in enumerate(nums)))
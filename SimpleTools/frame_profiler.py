@@ -0,0 +1,85 @@
+import csv
+import time
+import pygame
+from collections import deque
+from text_render_cache import render_text_line
+
+PHASES = ("events", "main_code", "ui_update", "ui_draw", "display_update")
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))]
+
+class FrameProfiler:
+    """Times each phase of a Window frame with perf_counter_ns and keeps the last history_length frames for rolling percentiles.
+    Window only calls it while enabled is True, otherwise frames run without any timing.
+
+    Example
+    >>> window.profiler.enabled = True
+    >>> window.profiler.get_summary()["main_code"]
+    {'p50': 0.41, 'p95': 0.52, 'p99': 0.9}
+    >>> window.profiler.export_csv("frame_times.csv")
+    """
+    def __init__(self, history_length=600, summary_interval=30):
+        self.enabled = False
+        self.show_overlay = False
+        self.frames = deque(maxlen=history_length) # Tuples of nanoseconds, one per phase
+        self.summary_interval = summary_interval # Frames between overlay updates, so the numbers are readable
+        self.frames_since_summary = summary_interval
+        self.overlay_lines = []
+        self.font = pygame.font.Font("freesansbold.ttf", 16)
+        self.current_frame = []
+        self.phase_start = 0
+
+    def start_frame(self):
+        self.current_frame = []
+        self.phase_start = time.perf_counter_ns()
+
+    def end_phase(self):
+        now = time.perf_counter_ns()
+        self.current_frame.append(now - self.phase_start)
+        self.phase_start = now
+
+    def skip(self):
+        "Don't count the time since the last phase ended, for example drawing the overlay itself."
+        self.phase_start = time.perf_counter_ns()
+
+    def end_frame(self):
+        self.frames.append(tuple(self.current_frame))
+        self.frames_since_summary += 1
+
+    def get_summary(self):
+        "p50, p95 and p99 in milliseconds for each phase and the whole frame, over the frames in the history."
+        summary = {}
+        columns = list(zip(*self.frames)) if self.frames else [() for _ in PHASES]
+        columns.append([sum(frame) for frame in self.frames])
+        for name, times in zip(PHASES + ("frame",), columns):
+            times = sorted(times)
+            summary[name] = {"p50": percentile(times, 50) / 1e6, "p95": percentile(times, 95) / 1e6, "p99": percentile(times, 99) / 1e6}
+        return summary
+
+    def export_csv(self, path):
+        "Write every frame in the history to a CSV file, one row per frame with nanoseconds for each phase."
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(PHASES + ("frame",))
+            for frame in self.frames:
+                writer.writerow(frame + (sum(frame),))
+
+    def draw_overlay(self, surface, pos=(10, 10)):
+        "Draw the rolling percentiles on a box at pos. Returns the box's rect."
+        if self.frames_since_summary >= self.summary_interval:
+            self.frames_since_summary = 0
+            self.overlay_lines = [("Phase (ms)", "p50", "p95", "p99")]
+            for name, stats in self.get_summary().items():
+                self.overlay_lines.append((name, f"{stats['p50']:.2f}", f"{stats['p95']:.2f}", f"{stats['p99']:.2f}"))
+
+        column_x = (10, 150, 210, 270) # Columns are placed by hand as the font isn't monospaced
+        line_height = self.font.get_linesize()
+        rect = pygame.Rect(pos, (330, line_height * len(self.overlay_lines) + 20))
+        surface.fill((30, 30, 30), rect)
+        for i, line in enumerate(self.overlay_lines):
+            for x, cell in zip(column_x, line):
+                surface.blit(render_text_line(self.font, cell, (255, 255, 255)), (rect.x + x, rect.y + 10 + i * line_height))
+        return rect
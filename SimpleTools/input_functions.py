@@ -1,5 +1,78 @@
 from fractions import Fraction
 from sys import exit
+from contextlib import contextmanager
+import os
+
+class QuitInput(BaseException):
+    """Raised instead of exiting when the user quits with "q" and raise_on_quit is set, so scripted runs can carry on.
+    Like SystemExit it isn't an Exception, so "except Exception" doesn't catch it."""
+
+class ScriptedInput:
+    """Gives answers from a list, iterator or file instead of asking the keyboard, so menus can run without anyone typing.
+    Raises EOFError when it runs out of answers, like input() does at the end of a file.
+
+    Example
+    >>> with scripted_input(["y", "12"]):
+    ...     limited_input()
+    ...     number_input()
+    """
+    def __init__(self, answers, echo=False):
+        self.answers = iter(answers)
+        self.echo = echo # Print the prompt and answer as if they were typed
+
+    def __call__(self, prompt=""):
+        try:
+            answer = next(self.answers)
+        except StopIteration:
+            raise EOFError("The input script has run out of answers.")
+        if self.echo:
+            print(prompt + answer)
+        return answer
+
+    @classmethod
+    def from_file(cls, file_name, echo=False):
+        "One answer per line."
+        with open(file_name, "r") as opened_file:
+            return cls(opened_file.read().splitlines(), echo)
+
+    @classmethod
+    def from_environment(cls, variable="INPUT_SCRIPT", echo=False):
+        """Answers from an environment variable, either the path of an answer file or answers separated by semicolons.
+        Returns None if the variable isn't set."""
+        value = os.environ.get(variable)
+        if value is None:
+            return None
+        if os.path.isfile(value):
+            return cls.from_file(value, echo)
+        return cls(value.split(";"), echo)
+
+input_source = None # A function like input(), None for the keyboard
+raise_on_quit = False # Raise QuitInput instead of exiting the program
+
+def set_input_source(source=None, raise_on_quit_instead_of_exit=None):
+    """Set where limited_input and number_input get answers from, for example a ScriptedInput. None goes back to the keyboard.
+    Quitting raises QuitInput instead of exiting while a source is set, unless raise_on_quit_instead_of_exit says otherwise."""
+    global input_source, raise_on_quit
+    input_source = source
+    raise_on_quit = source is not None if raise_on_quit_instead_of_exit is None else raise_on_quit_instead_of_exit
+
+@contextmanager
+def scripted_input(answers, echo=False):
+    "Use a list of answers for the input functions inside a with block, then go back to the previous input source."
+    previous_source, previous_raise_on_quit = input_source, raise_on_quit
+    set_input_source(ScriptedInput(answers, echo))
+    try:
+        yield
+    finally:
+        set_input_source(previous_source, previous_raise_on_quit)
+
+def get_input(prompt=""):
+    return input_source(prompt) if input_source is not None else input(prompt)
+
+def quit_input():
+    if raise_on_quit:
+        raise QuitInput()
+    exit()
 
 def correct_grammar(string:str):
     """Add a full stop to the end of a string if it doesn't have punctutation at the end."""
@@ -39,10 +112,10 @@ def limited_input(options:dict={"y": "Yes.", "n": "No."}, prompt:str="Select an
             print(f"{letter} | {option_desc}")
 
     while True:
-        user_input = input(": ").lower().strip()
+        user_input = get_input(": ").lower().strip()
 
         if allow_quit and user_input == "q": # Quit
-            exit()
+            quit_input()
         elif user_input in possible_options: # Valid
             if print_output: print(f"Selected option: {options[user_input]}")
             return user_input
@@ -77,9 +150,9 @@ def number_input(prompt:str="Enter a number.", input_type:type=int, only_positiv
 
     while True:
         try:
-            user_input = input(": ").strip().lower()
+            user_input = get_input(": ").strip().lower()
             if allow_quit and user_input == "q":
-                exit()
+                quit_input()
             
             # Convert to type or fraction
             if input_type == float: 
@@ -95,6 +168,12 @@ def number_input(prompt:str="Enter a number.", input_type:type=int, only_positiv
             
             if print_output: print(f"You entered: {converted_user_input}.")
             return converted_user_input
+        except EOFError: # Out of input, asking again would loop forever
+            raise
         except Exception as e:
             print(f"Invalid input. Please try again. Error: {e}.")
 
+# Lets a whole program run from an answer script, for example INPUT_SCRIPT="y;12" python program.py
+environment_input_script = ScriptedInput.from_environment()
+if environment_input_script is not None:
+    set_input_source(environment_input_script)
@@ -1,7 +1,10 @@
 import pygame
 import pygame_gui
+import os
 from sys import exit
 from os.path import join
+from text_render_cache import render_text_line
+from frame_profiler import FrameProfiler
 
 pygame.font.init()
 
@@ -13,37 +16,138 @@ FONTS = {
 
 COLORS = pygame.colordict.THECOLORS
 
+def enable_headless_mode():
+    """Use SDL's dummy drivers so windows draw to an offscreen surface instead of a real display, for example in CI.
+    Must be called before the first Window is created. Setting the environment variable PYGAME_HEADLESS=1 does the same."""
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+if os.environ.get("PYGAME_HEADLESS"):
+    enable_headless_mode()
+
 class Window:
-    def __init__(self, display_name = "Display", dimensions = (1280, 720)):
+    """Base window. Subclasses put their drawing in main_code and event handling in process_events.
+
+    max_fps caps the frame rate (0 for no cap) so the loop doesn't use a whole CPU core.
+    If idle_when_still is True the loop waits for an event (or idle_timeout milliseconds) before each frame whenever is_animating()
+    returns False, so menus that aren't changing use almost no CPU.
+    If use_dirty_rects is True only the regions passed to mark_dirty are cleared and sent to the display each frame,
+    instead of clearing and updating the whole display. Call request_full_redraw when everything changes, for example on a new page.
+    F4 toggles an overlay of how long each part of the frame takes. If profile is True frames are timed even while it is hidden,
+    see self.profiler for the numbers and CSV export."""
+    def __init__(self, display_name = "Display", dimensions = (1280, 720), max_fps = 60, idle_when_still = False, use_dirty_rects = False, profile = False):
         pygame.init()
         self.display = pygame.display.set_mode(dimensions, pygame.RESIZABLE)
         pygame.display.set_caption(display_name)
         self.background_color = (0, 0, 0)
         self.ui_manager  = pygame_gui.UIManager((1280, 720))
 
+        self.clock = pygame.time.Clock()
+        self.max_fps = max_fps
+        self.time_delta = 0 # Seconds since the last frame
+        self.idle_when_still = idle_when_still
+        self.idle_timeout = 500 # Milliseconds, so timers and clocks still update while idle
+
+        self.use_dirty_rects = use_dirty_rects
+        self.dirty_rects = []
+        self.full_redraw = True # The first frame always draws everything
+
+        self.profile = profile
+        self.profiler = FrameProfiler()
+        self.profiler.enabled = profile
+
     def run(self):
         while True:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.stop()
+            self.run_frame()
+
+    def get_events(self):
+        if self.idle_when_still and not self.is_animating():
+            first_event = pygame.event.wait(self.idle_timeout)
+            if first_event.type == pygame.NOEVENT:
+                return []
+            return [first_event] + pygame.event.get()
+        return pygame.event.get()
+
+    def handle_events(self):
+        for event in self.get_events():
+            if event.type == pygame.QUIT:
+                self.stop()
+
+            if event.type in (pygame.VIDEORESIZE, pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.request_full_redraw()
 
-                # if event.type == pygame.VIDEORESIZE:
-                #     self.display = pygame.display.set_mode((event.w, event.h), pygame.RESIZABLE)
-                #     self.ui_manager.set_window_resolution((event.w, event.h))
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                self.toggle_profiler_overlay()
 
-                self.ui_manager.process_events(event)
+            # if event.type == pygame.VIDEORESIZE:
+            #     self.display = pygame.display.set_mode((event.w, event.h), pygame.RESIZABLE)
+            #     self.ui_manager.set_window_resolution((event.w, event.h))
 
-                self.process_events(event)
-            
-            self.main_code()
-            
-            self.ui_manager.update(pygame.time.get_ticks())
-            self.ui_manager.draw_ui(self.display)
+            self.ui_manager.process_events(event)
 
+            self.process_events(event)
+
+    def update_display(self):
+        if self.use_dirty_rects and not self.full_redraw:
+            pygame.display.update(self.dirty_rects)
+        else:
             pygame.display.update()
+        self.dirty_rects = []
+        self.full_redraw = False
 
+        if not self.use_dirty_rects:
             self.display.fill(self.background_color)
-    
+
+    def run_frame(self):
+        profiler = self.profiler
+        timing = profiler.enabled # Each phase is timed only while the profiler is on, otherwise this is a few skipped ifs
+
+        if self.use_dirty_rects and self.full_redraw:
+            self.display.fill(self.background_color)
+
+        if timing:
+            profiler.start_frame()
+        self.handle_events()
+        if timing:
+            profiler.end_phase()
+        self.main_code()
+        if timing:
+            profiler.end_phase()
+        self.ui_manager.update(self.time_delta)
+        if timing:
+            profiler.end_phase()
+        self.ui_manager.draw_ui(self.display)
+        if timing:
+            profiler.end_phase()
+            if profiler.show_overlay:
+                self.dirty_rects.append(profiler.draw_overlay(self.display, (self.display.get_width() - 340, 10)))
+                profiler.skip()
+        self.update_display()
+        if timing:
+            profiler.end_phase()
+            profiler.end_frame()
+
+        self.time_delta = self.clock.tick(self.max_fps) / 1000
+
+    def toggle_profiler_overlay(self):
+        self.profiler.show_overlay = not self.profiler.show_overlay
+        self.profiler.enabled = self.profiler.show_overlay or self.profile
+        self.request_full_redraw() # Clears the overlay when it is hidden
+
+    def is_animating(self):
+        "Override to return True while something moves on its own, so idle_when_still doesn't wait for events."
+        return False
+
+    def mark_dirty(self, rect):
+        "Clear a region to the background colour and send it to the display this frame. Call before drawing into it."
+        rect = pygame.Rect(rect)
+        self.display.fill(self.background_color, rect)
+        self.dirty_rects.append(rect)
+
+    def request_full_redraw(self):
+        "Clear and update the whole display next frame."
+        self.full_redraw = True
+
     def process_events(self, event):
         pass
 
@@ -81,23 +185,47 @@ class Button(pygame.sprite.Sprite):
         self.border_hover_colour = border_hover_colour
         self.border_width = border_width
         self.resize = resize
-    
-    def update(self):
-        """Update the button."""
-        # Check if the mouse is hovering over the button
-        self.is_hovered = self.rect.collidepoint(pygame.mouse.get_pos())
-        colour = self.hover_colour if self.is_hovered else self.button_colour
-        border_colour = self.border_hover_colour if self.is_hovered else self.border_colour
+
+        # Pre-rendered surfaces for both hover states, rebuilt only when something that changes how the button looks changes
+        self.normal_image = None
+        self.hover_image = None
+        self.rendered_appearance = None
+
+    def get_appearance(self):
+        "Everything that changes how the button looks. Colours are copied to tuples so changing a pygame.Color in place is noticed too."
+        return (self.rect.size, self.text_padding, self.body_text_offset, self.border_width,
+                self.heading_text, tuple(self.heading_text_colour), self.heading_text_font,
+                self.body_text, tuple(self.body_text_colour), self.body_text_font,
+                tuple(self.button_colour), tuple(self.hover_colour), tuple(self.border_colour), tuple(self.border_hover_colour))
+
+    def render_surface(self, colour, border_colour):
+        surface = pygame.Surface(self.rect.size)
 
         # Fill the button background colour
-        self.image.fill(colour)
+        surface.fill(colour)
 
         # Draw the border around the button
-        pygame.draw.rect(self.image, border_colour, self.image.get_rect(), self.border_width)
+        pygame.draw.rect(surface, border_colour, surface.get_rect(), self.border_width)
 
         # Draw text
-        draw_text((self.text_padding, self.text_padding), self.heading_text, self.heading_text_colour, self.heading_text_font, surface=self.image)
-        draw_text((self.text_padding, self.body_text_offset + self.text_padding), self.body_text, self.body_text_colour, self.body_text_font, surface=self.image)
+        draw_text((self.text_padding, self.text_padding), self.heading_text, self.heading_text_colour, self.heading_text_font, surface=surface)
+        draw_text((self.text_padding, self.body_text_offset + self.text_padding), self.body_text, self.body_text_colour, self.body_text_font, surface=surface)
+        return surface
+
+    def render_surfaces(self):
+        self.normal_image = self.render_surface(self.button_colour, self.border_colour)
+        self.hover_image = self.render_surface(self.hover_colour, self.border_hover_colour)
+        self.rendered_appearance = self.get_appearance()
+
+    def update(self):
+        """Update the button. Only redraws it if its text, colours or size have changed, otherwise just swaps to the surface for the hover state."""
+        # Check if the mouse is hovering over the button
+        self.is_hovered = self.rect.collidepoint(pygame.mouse.get_pos())
+
+        if self.get_appearance() != self.rendered_appearance:
+            self.render_surfaces()
+
+        self.image = self.hover_image if self.is_hovered else self.normal_image
 
     def is_clicked(self):
         """Check if the button is clicked."""
@@ -105,7 +233,9 @@ class Button(pygame.sprite.Sprite):
             return True
         return False
 
-def draw_text(pos, text="Text", colour=COLORS["white"], font=FONTS["text"], line_spacing=0, wrap_text=False, centred=False, surface=pygame.display.get_surface(), return_size=False):
+def draw_text(pos, text="Text", colour=COLORS["white"], font=FONTS["text"], line_spacing=0, wrap_text=False, centred=False, surface=None, return_size=False):
+    if surface is None:
+        surface = pygame.display.get_surface()
     if wrap_text:
         text = text.replace(". ", ".\n")
     
@@ -116,7 +246,7 @@ def draw_text(pos, text="Text", colour=COLORS["white"], font=FONTS["text"], line
 
     lines = text.split("\n")
     for line in lines:
-        text_surface = font.render(line, True, colour)
+        text_surface = render_text_line(font, line, colour)
         text_rect = text_surface.get_rect(topleft=pos)
         surface.blit(text_surface, text_rect)
         pos[1] += text_surface.get_height() + line_spacing
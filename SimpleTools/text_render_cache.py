@@ -0,0 +1,49 @@
+import pygame
+from collections import OrderedDict
+
+class TextRenderCache:
+    """Keeps rendered lines of text so drawing the same text again is just a blit instead of another font.render.
+    Lines are keyed by (font, text, colour, antialias). Only the max_entries most recently used lines are kept,
+    so text that changes every frame (like an FPS counter) can't make it grow forever.
+
+    Example
+    >>> surface = text_render_cache.render(font, "Hello", (255, 255, 255))
+    >>> text_render_cache.get_stats()
+    {'hits': 0, 'misses': 1, 'hit rate': 0.0, 'entries': 1}
+    """
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font:pygame.font.Font, text, colour, antialias=True):
+        key = (font, text, tuple(colour), antialias) # Colours are copied to tuples as pygame.Color can be changed in place
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, colour)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def get_stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit rate": self.hits / total if total else 0.0, "entries": len(self.surfaces)}
+
+    def clear(self):
+        self.surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+# Shared by every draw_text
+text_render_cache = TextRenderCache()
+
+def render_text_line(font:pygame.font.Font, text, colour, antialias=True):
+    "Same as font.render(text, antialias, colour) but uses the shared cache. Don't draw on the returned surface, it is shared."
+    return text_render_cache.render(font, text, colour, antialias)
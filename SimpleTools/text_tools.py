@@ -3,6 +3,20 @@ import string as string_constants
 import csv
 import json
 import re
+import mmap
+import os
+import hashlib
+import pickle
+import sys
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError: # Only used for speed, everything has a fallback without it
+    np = None
 
 def remove_content_in_parentheses(input_string):
     """Removes all text, including the parentheses, between brackets () in the input string."""
@@ -14,13 +28,115 @@ def remove_content_in_parentheses(input_string):
     # \) : Matches a literal closing parenthesis. We use a backslash to escape it.
     return re.sub(r'\(.*?\)', '', input_string)
 
-def open_text(file_name):
+def estimate_memory_size(value, sample_size=1000):
+    """Estimate the bytes of memory a loaded result uses, following lists, tuples, sets and dictionaries.
+    Objects shared between several places (like the keys of read_csv's rows) are only counted once.
+    Lists and tuples longer than sample_size are estimated from sample_size evenly spaced items, so this stays quick for big files."""
+    seen = set()
+    total = 0
+    values_to_check = [(value, 1)] # (value, how many values it stands for)
+    while values_to_check:
+        value, weight = values_to_check.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        total += sys.getsizeof(value) * weight
+        if isinstance(value, dict):
+            values_to_check.extend((item, weight) for item in value.keys())
+            values_to_check.extend((item, weight) for item in value.values())
+        elif isinstance(value, (list, tuple)) and len(value) > sample_size:
+            step = len(value) / sample_size
+            values_to_check.extend((value[int(index * step)], weight * step) for index in range(sample_size))
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            values_to_check.extend((item, weight) for item in value)
+        elif np is not None and isinstance(value, np.ndarray) and value.dtype == object:
+            values_to_check.append((value.ravel().tolist(), weight))
+    return int(total)
+
+class FileLoadCache:
+    """Keeps the results of loading files (for example with read_csv) so loading the same unchanged file again skips reading and parsing.
+    A file counts as unchanged if its modification time and size are the same as when it was loaded.
+
+    The estimated memory used by the cached results is kept under max_bytes, removing the least recently used first.
+    Results are measured with estimate_memory_size unless load is given another sizeof function.
+    If cache_directory is given, results are also pickled there so they survive between runs.
+    Only use a cache directory you trust, because loading a pickle can run code.
+
+    Cached results are shared, so don't change them in place."""
+    def __init__(self, max_bytes=64 * 1024 * 1024, cache_directory=None):
+        self.max_bytes = max_bytes
+        self.cache_directory = cache_directory
+        self.entries = OrderedDict() # (loader name, path): (modification time, file size, result size, result)
+        self.total_bytes = 0 # Estimated memory used by the results
+        self.hits = 0
+        self.misses = 0
+
+    def get_cache_file_name(self, key):
+        return os.path.join(self.cache_directory, hashlib.sha1(repr(key).encode()).hexdigest() + ".pickle")
+
+    def load(self, file_name, loader, sizeof=estimate_memory_size):
+        "Returns loader(file_name), from the cache if the file hasn't changed. sizeof(result) gives the bytes a result counts for."
+        path = os.path.abspath(file_name)
+        file_stats = os.stat(path)
+        key = (loader.__qualname__, path)
+        version = (file_stats.st_mtime_ns, file_stats.st_size)
+
+        entry = self.entries.get(key)
+        if entry is not None and entry[:2] == version:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[3]
+        self.misses += 1
+
+        found_on_disk = False
+        cache_file_name = self.get_cache_file_name(key) if self.cache_directory is not None else None
+        if cache_file_name is not None and os.path.exists(cache_file_name):
+            try:
+                with open(cache_file_name, "rb") as cache_file:
+                    cached_version, cached_result = pickle.load(cache_file)
+                if cached_version == version:
+                    result = cached_result
+                    found_on_disk = True
+            except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+                pass # A broken cache file is just loaded again
+
+        if not found_on_disk:
+            result = loader(path)
+            if cache_file_name is not None:
+                os.makedirs(self.cache_directory, exist_ok=True)
+                with open(cache_file_name, "wb") as cache_file:
+                    pickle.dump((version, result), cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        if entry is not None:
+            self.total_bytes -= entry[2]
+            del self.entries[key]
+        result_size = sizeof(result)
+        if result_size <= self.max_bytes:
+            self.entries[key] = (*version, result_size, result)
+            self.total_bytes += result_size
+            while self.total_bytes > self.max_bytes:
+                _, (_, _, size, _) = self.entries.popitem(last=False)
+                self.total_bytes -= size
+        return result
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+file_load_cache = FileLoadCache()
+
+def open_text(file_name, cached=False):
+    """Reads a text file. If cached is True the shared file_load_cache is used."""
+    if cached:
+        return file_load_cache.load(file_name, open_text)
     with open(file_name, mode="r") as opened_file:
         read = opened_file.read()
     return read
 
-def read_csv(file_name):
-    """Reads a CSV file and returns a list of dictionaries."""
+def read_csv(file_name, cached=False):
+    """Reads a CSV file and returns a list of dictionaries. If cached is True the shared file_load_cache is used."""
+    if cached:
+        return file_load_cache.load(file_name, read_csv)
     read = []
     with open(file_name, mode="r", newline="") as opened_file:
         DictRead = csv.DictReader(opened_file) # Create a DictReader object
@@ -28,12 +144,217 @@ def read_csv(file_name):
             read.append(row) # Add the row dictionary to the list
     return read
 
-def read_json(file_name):
-    """Reads a JSON file and returns a dictionary."""
+def stream_csv(file_name, buffer_size=64 * 1024):
+    """Reads a CSV file one row at a time, yielding a dictionary for each row.
+    Only buffer_size bytes of the file are held in memory, so this works on files bigger than memory."""
+    with open(file_name, mode="r", newline="", buffering=buffer_size) as opened_file:
+        yield from csv.DictReader(opened_file)
+
+# Type codes for array.array and the matching NumPy dtypes
+COLUMN_TYPE_CODES = {int: "q", float: "d"}
+COLUMN_DTYPES = {int: "int64", float: "float64", str: "object"}
+
+INT64_RANGE = range(-2**63, 2**63)
+
+def infer_column_type(values):
+    """Returns int, float or str, the narrowest type every value can be parsed as. Empty values count as missing floats.
+    Integers too big for int64 (like long IDs) make the column str so they aren't rounded."""
+    column_type = int
+    for value in values:
+        if value == "":
+            if column_type == int:
+                column_type = float
+            continue
+        try:
+            parsed = column_type(value)
+            if column_type == int and parsed not in INT64_RANGE:
+                return str
+        except ValueError:
+            if column_type == int:
+                try:
+                    float(value)
+                    column_type = float
+                    continue
+                except ValueError:
+                    pass
+            return str
+    return column_type
+
+def read_csv_columns(file_name, columns=None, dtypes=None, infer_rows=1000, use_numpy=True, buffer_size=64 * 1024):
+    """Reads selected columns of a CSV file into typed arrays instead of one dictionary per row, which uses far less memory.
+
+    Args
+    ----
+    columns : list, default=None
+        The column names to read. Reads every column if None.
+    dtypes : dict, default=None
+        Column name to int, float or str. Columns not given are inferred from the first infer_rows rows.
+        If a later value doesn't fit an inferred type the column is widened (int to float to str).
+    use_numpy : bool, default=True
+        Return NumPy arrays if NumPy is installed, otherwise array.array (or a list for str columns).
+
+    Returns
+    -------
+    dict
+        Column name to array of values. Empty and missing values become nan in float columns.
+    """
+    dtypes = dict(dtypes or {})
+    given_columns = set(dtypes) # Only inferred columns are widened, bad values in the others raise ValueError
+    with open(file_name, mode="r", newline="", buffering=buffer_size) as opened_file:
+        reader = csv.reader(opened_file)
+        header = next(reader)
+        if columns is None:
+            columns = header
+        indexes = [header.index(column) for column in columns]
+
+        # Read rows to infer the types from, they are parsed with the rest afterwards
+        first_rows = [row for _, row in zip(range(infer_rows), reader)]
+        for column, index in zip(columns, indexes):
+            if column not in dtypes:
+                dtypes[column] = infer_column_type(row[index] if index < len(row) else "" for row in first_rows)
+
+        values = {column: array(COLUMN_TYPE_CODES[dtypes[column]]) if dtypes[column] in COLUMN_TYPE_CODES else [] for column in columns}
+
+        def add_rows(rows):
+            for row in rows:
+                for column, index in zip(columns, indexes):
+                    value = row[index] if index < len(row) else "" # Short rows are treated as empty cells, like read_csv
+                    column_type = dtypes[column]
+                    try:
+                        if column_type == str:
+                            values[column].append(value)
+                        elif value == "" and column_type == float:
+                            values[column].append(float("nan"))
+                        else:
+                            values[column].append(column_type(value))
+                    except (ValueError, OverflowError): # OverflowError is an integer too big for int64
+                        if column in given_columns:
+                            raise ValueError(f"Can't read {value!r} in column {column!r} as {column_type.__name__}.")
+                        widen_column(column, index, value)
+
+        def widen_column(column, index, value):
+            "Change a column to the next wider type and add the value which didn't fit."
+            if dtypes[column] == int and (value == "" or infer_column_type([value]) == float):
+                dtypes[column] = float
+                values[column] = array("d", values[column])
+                values[column].append(float(value) if value != "" else float("nan"))
+            else:
+                # Numbers can't be turned back into the text they were read from ("1" would become "1.0"), so reread it
+                dtypes[column] = str
+                values[column] = read_raw_column(index, len(values[column]))
+                values[column].append(value)
+
+        def read_raw_column(index, row_count):
+            "The text of the first row_count cells of a column. Only needed when a column is widened to str, which is rare."
+            with open(file_name, mode="r", newline="", buffering=buffer_size) as raw_file:
+                raw_reader = csv.reader(raw_file)
+                next(raw_reader)
+                return [row[index] if index < len(row) else "" for _, row in zip(range(row_count), raw_reader)]
+
+        add_rows(first_rows)
+        del first_rows
+        add_rows(reader)
+
+    if use_numpy and np is not None:
+        return {column: np.frombuffer(values[column], dtype=COLUMN_DTYPES[dtypes[column]]) if dtypes[column] != str else np.array(values[column], dtype=object) for column in columns}
+    return values
+
+def read_json(file_name, cached=False):
+    """Reads a JSON file and returns a dictionary. If cached is True the shared file_load_cache is used."""
+    if cached:
+        return file_load_cache.load(file_name, read_json)
     with open(file_name, "r") as opened_file:
         read = json.load(opened_file)
     return read
 
+def batched(iterable, batch_size):
+    "Yields lists of up to batch_size items from the iterable."
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+def iter_json_lines(file_name, batch_size=None):
+    """Reads a JSON Lines file (one JSON value per line) one record at a time from a memory-mapped file.
+    Yields lists of batch_size records instead if batch_size is given. Blank lines are skipped."""
+    def records():
+        with open(file_name, "rb") as opened_file:
+            if opened_file.seek(0, 2) == 0: # Empty files can't be memory-mapped
+                return
+            with mmap.mmap(opened_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                for line in iter(mapped_file.readline, b""):
+                    if line.strip():
+                        yield json.loads(line)
+
+    return records() if batch_size is None else batched(records(), batch_size)
+
+def iter_json_array(file_name, batch_size=None, chunk_size=64 * 1024):
+    """Reads the elements of a file containing one top-level JSON array one at a time, without loading the whole file.
+    Yields lists of batch_size elements instead if batch_size is given.
+    Raises ValueError if the file isn't a JSON array."""
+    def elements():
+        decoder = json.JSONDecoder()
+        with open(file_name, "r") as opened_file:
+            buffer = ""
+            position = 0
+            end_of_file = False
+            expecting = "[" # Then "element or ]" for the first element, "element" after a comma and ", or ]" after an element
+
+            while True:
+                # Skip whitespace
+                while position < len(buffer) and buffer[position] in " \t\r\n":
+                    position += 1
+
+                if position < len(buffer):
+                    character = buffer[position]
+                    if expecting == "[":
+                        if character != "[":
+                            raise ValueError(f"{file_name} doesn't contain a JSON array.")
+                        expecting = "element or ]"
+                        position += 1
+                        continue
+                    if expecting == ", or ]":
+                        if character == "]":
+                            return
+                        if character != ",":
+                            raise ValueError(f"{file_name} is missing a comma between JSON array elements.")
+                        expecting = "element"
+                        position += 1
+                        continue
+                    if character == "]":
+                        if expecting == "element":
+                            raise ValueError(f"{file_name} has a trailing comma in its JSON array.")
+                        return
+
+                    try:
+                        element, end = decoder.raw_decode(buffer, position)
+                        next_position = end
+                        while next_position < len(buffer) and buffer[next_position] in " \t\r\n":
+                            next_position += 1
+
+                        # Only accept the element once the character after it is read, as a number like 1.5 can be split across chunks
+                        if next_position < len(buffer):
+                            if buffer[next_position] in ",]":
+                                yield element
+                                position = end
+                                expecting = ", or ]"
+                                continue
+                            if end_of_file or buffer[end:].strip("0123456789.eE+-") != "":
+                                raise ValueError(f"{file_name} is missing a comma between JSON array elements.")
+                    except json.JSONDecodeError:
+                        if end_of_file:
+                            raise
+
+                if end_of_file:
+                    raise ValueError(f"{file_name} ended before the JSON array was closed.")
+
+                # Read more, at least doubling the buffer so big elements don't get decoded over and over
+                chunk = opened_file.read(max(chunk_size, len(buffer) - position))
+                end_of_file = chunk == ""
+                buffer = buffer[position:] + chunk
+                position = 0
+
+    return elements() if batch_size is None else batched(elements(), batch_size)
+
 def remove_letters_after_string(input_text = "Demo # hashtag", string = "#"):
     """Will remove the letters after a string from all lines in input_text.
     
@@ -48,23 +369,177 @@ def remove_letters_after_string(input_text = "Demo # hashtag", string = "#"):
         Output:
             Demo
             Demo2"""
-    lines = input_text.split('\n')
-    new_lines = []
+    return '\n'.join(remove_letters_after_string_in_lines(input_text.split('\n'), string))
 
-    for line in lines:
-        if not line.startswith(string):
-            line = line.split(string)[0].rstrip()
-            new_lines.append(line)
+def remove_letters_after_string_in_lines(lines, string = "#"):
+    """Same as remove_letters_after_string but takes and returns a list of lines. Lines starting with string are removed."""
+    return [line.partition(string)[0].rstrip() for line in lines if not line.startswith(string)]
 
-    output = '\n'.join(new_lines)
-    return output
+class TextPipeline:
+    """A chain of line by line text cleaning steps which can be run on huge files.
+    The pipeline is sent to each worker process once and its regexes are compiled there once. Files are read in chunks split on line boundaries,
+    the chunks are cleaned in a process pool and written out in the original order.
+
+    Example
+    >>> pipeline = TextPipeline().remove_content_in_parentheses().remove_letters_after_string("#").substitute(r"\\s+", " ")
+    >>> pipeline.process_text("Demo (note) # Comment")
+    'Demo'
+    >>> pipeline.run_on_file("big_input.txt", "clean_output.txt")
+    """
+    def __init__(self):
+        self.steps = [] # ("remove after", string) or ("substitute", pattern, replacement, flags)
+        self.compiled_steps = None
+
+    def remove_letters_after_string(self, string="#"):
+        self.steps.append(("remove after", string))
+        self.compiled_steps = None
+        return self
+
+    def remove_content_in_parentheses(self):
+        return self.substitute(r'\(.*?\)', '')
+
+    def substitute(self, pattern, replacement="", flags=0):
+        "Add a regex substitution, like re.sub(pattern, replacement, line, flags=flags) on every line."
+        self.steps.append(("substitute", pattern, replacement, flags))
+        self.compiled_steps = None
+        return self
+
+    def __getstate__(self):
+        # Compiled regexes are rebuilt in each worker process instead of being pickled
+        return {"steps": self.steps, "compiled_steps": None}
+
+    def process_lines(self, lines):
+        if self.compiled_steps is None:
+            self.compiled_steps = [(step[0], re.compile(step[1], step[3]).sub, step[2]) if step[0] == "substitute" else step for step in self.steps]
+
+        for step in self.compiled_steps:
+            if step[0] == "substitute":
+                substitute, replacement = step[1], step[2]
+                lines = [substitute(replacement, line) for line in lines]
+            else:
+                lines = remove_letters_after_string_in_lines(lines, step[1])
+        return lines
+
+    def process_text(self, text):
+        return '\n'.join(self.process_lines(text.split('\n')))
+
+    def process_chunk(self, chunk):
+        "Clean a chunk of whole lines and return it as text with a newline after every line."
+        lines = chunk.split('\n')
+        if chunk.endswith('\n'):
+            lines.pop()
+        lines = self.process_lines(lines)
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def run_on_file(self, input_file_name, output_file_name, chunk_size=1024 * 1024, processes=None):
+        """Clean input_file_name into output_file_name. Reads about chunk_size characters at a time, always ending on a line break.
+        processes is the number of worker processes (default: one per CPU), 1 runs everything in this process.
+        At most two chunks per process are in memory at once."""
+        processes = processes or os.cpu_count() or 1
+
+        def read_chunks(input_file):
+            while chunk := input_file.read(chunk_size):
+                yield chunk + input_file.readline() # Finish the last line
+
+        with open(input_file_name, "r") as input_file, open(output_file_name, "w") as output_file:
+            if processes == 1:
+                for chunk in read_chunks(input_file):
+                    output_file.write(self.process_chunk(chunk))
+                return
+
+            # Only the chunks are sent with each task, the pipeline is set up once per worker by the initializer
+            with ProcessPoolExecutor(max_workers=processes, initializer=set_worker_pipeline, initargs=(self,)) as executor:
+                pending = deque()
+                for chunk in read_chunks(input_file):
+                    pending.append(executor.submit(process_chunk_in_worker, chunk))
+                    if len(pending) >= processes * 2:
+                        output_file.write(pending.popleft().result())
+                while pending:
+                    output_file.write(pending.popleft().result())
+
+worker_pipeline = None # The TextPipeline a worker process of TextPipeline.run_on_file uses
+
+def set_worker_pipeline(pipeline):
+    global worker_pipeline
+    worker_pipeline = pipeline
+
+def process_chunk_in_worker(chunk):
+    return worker_pipeline.process_chunk(chunk)
+
+RANDOM_STRING_ALPHABET = string_constants.ascii_letters + ' '
 
 def generate_random_string(length):
     """Generates a random string of the specified length."""
-    random_string = ''.join(random.choices(string_constants.ascii_letters + ' ', k=length))
+    random_string = ''.join(random.choices(RANDOM_STRING_ALPHABET, k=length))
 
     return random_string
 
+def get_single_byte_text(text, name="alphabet"):
+    "Encodes text as one byte per character, so random bytes can be picked from an alphabet and records have a fixed width."
+    try:
+        return text.encode("latin-1")
+    except UnicodeEncodeError:
+        raise ValueError(f"The {name} can only contain single byte (latin-1) characters.")
+
+def generate_random_records(count, field_widths, alphabet=RANDOM_STRING_ALPHABET, seed=None, field_separator=",", line_separator="\n"):
+    """Generates count fixed width records as one bytes object, each made of random fields of field_widths characters.
+    For example generate_random_records(2, (3, 5)) gives something like b"kTe,QwzrA\\nPoL,aVbnM\\n".
+    With NumPy every character is sampled in one vectorized call, otherwise it falls back to the random module.
+    The same seed always gives the same records."""
+    alphabet_bytes = get_single_byte_text(alphabet)
+    if not alphabet_bytes:
+        raise ValueError("The alphabet can't be empty.")
+    separator_bytes = get_single_byte_text(field_separator, "field separator")
+    line_separator_bytes = get_single_byte_text(line_separator, "line separator")
+    characters_per_record = sum(field_widths)
+
+    if np is None:
+        random_generator = random.Random(seed)
+        records = []
+        for _ in range(count):
+            characters = random_generator.choices(alphabet, k=characters_per_record)
+            fields = []
+            start = 0
+            for width in field_widths:
+                fields.append("".join(characters[start:start + width]))
+                start += width
+            records.append(field_separator.join(fields) + line_separator)
+        return "".join(records).encode("latin-1")
+
+    # One record is a template of separator bytes, with a mask of where the random characters go
+    template = bytearray()
+    is_field_character = []
+    for index, width in enumerate(field_widths):
+        if index > 0:
+            template += separator_bytes
+            is_field_character += [False] * len(separator_bytes)
+        template += b"\0" * width
+        is_field_character += [True] * width
+    template += line_separator_bytes
+    is_field_character += [False] * len(line_separator_bytes)
+
+    random_generator = np.random.default_rng(seed)
+    records = np.tile(np.frombuffer(bytes(template), dtype=np.uint8), (count, 1))
+    random_indexes = random_generator.integers(0, len(alphabet_bytes), size=(count, characters_per_record), dtype=np.uint16)
+    records[:, np.array(is_field_character, dtype=bool)] = np.frombuffer(alphabet_bytes, dtype=np.uint8)[random_indexes]
+    return records.tobytes()
+
+def generate_random_strings(count, length, alphabet=RANDOM_STRING_ALPHABET, seed=None):
+    """Generates a list of count random strings of the specified length, much faster than calling generate_random_string count times."""
+    if length == 0:
+        return [""] * count
+    records = generate_random_records(count, (length,), alphabet, seed, line_separator="")
+    return [records[index:index + length].decode("latin-1") for index in range(0, len(records), length)]
+
+def write_random_records(file_name, count, field_widths=(32,), alphabet=RANDOM_STRING_ALPHABET, seed=None, batch_size=100_000, field_separator=",", line_separator="\n"):
+    """Writes count random fixed width records (see generate_random_records) straight to a file, batch_size records at a time,
+    so gigabytes of test data can be made without holding it all in memory."""
+    random_generator = random.Random(seed) # Gives each batch its own seed, so the file is the same for the same seed
+    with open(file_name, "wb") as opened_file:
+        for start in range(0, count, batch_size):
+            batch_seed = random_generator.getrandbits(64)
+            opened_file.write(generate_random_records(min(batch_size, count - start), field_widths, alphabet, batch_seed, field_separator, line_separator))
+
 def text_pyramid(text, starting_modulo):
     """Generates a pyramid of text from the input text like this (Assuming starting_modulo = 4):
         Hello world
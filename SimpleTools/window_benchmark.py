@@ -0,0 +1,118 @@
+import json
+import statistics
+import time
+import pygame
+from pygame_simple_base import enable_headless_mode
+from frame_profiler import percentile
+
+def key_press(key):
+    "Events for pressing and releasing a key, for use in a benchmark script."
+    return [pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode="", scancode=0),
+            pygame.event.Event(pygame.KEYUP, key=key, mod=0, unicode="", scancode=0)]
+
+def mouse_click(pos, button=1):
+    "Events for clicking the mouse at pos, for use in a benchmark script."
+    return [pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=button),
+            pygame.event.Event(pygame.MOUSEBUTTONUP, pos=pos, button=button)]
+
+def run_benchmark(window, script, warmup_frames=10):
+    """Drive a Window through a script and time every frame with perf_counter_ns.
+    window should be created after enable_headless_mode() when there is no display. Its frame cap and idle mode are turned off.
+
+    The script is a list of (action, value) steps:
+    ("page", page_state)   calls window.set_page_state(page_state)
+    ("events", events)     posts a list of pygame events, handled in the next frame
+    ("mouse", pos)         moves the mouse to pos
+    ("frames", count)      runs count frames, timed under the current label
+    ("label", label)       times the following frames under label, the default label is the page state
+
+    Returns a dictionary of label: list of frame times in nanoseconds, see get_frame_time_stats."""
+    window.max_fps = 0
+    window.idle_when_still = False
+    for _ in range(warmup_frames): # Fills the text and button caches so the first page isn't slower
+        window.run_frame()
+
+    frame_times = {}
+    label = None
+    for action, value in script:
+        if action == "page":
+            window.set_page_state(value)
+        elif action == "events":
+            for event in value:
+                pygame.event.post(event)
+        elif action == "mouse":
+            pygame.mouse.set_pos(value)
+            pygame.event.post(pygame.event.Event(pygame.MOUSEMOTION, pos=value, rel=(0, 0), buttons=(0, 0, 0)))
+        elif action == "label":
+            label = value
+        elif action == "frames":
+            times = frame_times.setdefault(label or getattr(window, "page_state", "frames"), [])
+            for _ in range(value):
+                start = time.perf_counter_ns()
+                window.run_frame()
+                times.append(time.perf_counter_ns() - start)
+        else:
+            raise ValueError(f"Unknown benchmark action {action!r}.")
+    return frame_times
+
+def get_frame_time_stats(frame_times):
+    "Frame time distribution for each label, in milliseconds."
+    stats = {}
+    for label, times in frame_times.items():
+        times = sorted(times)
+        stats[label] = {
+            "frames": len(times),
+            "mean": statistics.fmean(times) / 1e6 if times else 0,
+            "p50": percentile(times, 50) / 1e6,
+            "p95": percentile(times, 95) / 1e6,
+            "p99": percentile(times, 99) / 1e6,
+            "max": times[-1] / 1e6 if times else 0,
+        }
+    return stats
+
+def save_baseline(stats, path):
+    with open(path, "w") as file:
+        json.dump(stats, file, indent=4)
+
+def find_regressions(stats, baseline_path, tolerance=1.25, percentiles=("p50", "p95")):
+    """Compare stats against a baseline saved by save_baseline.
+    Returns a list of (label, percentile, baseline ms, current ms) that are more than tolerance times slower."""
+    with open(baseline_path, "r") as file:
+        baseline = json.load(file)
+
+    regressions = []
+    for label, label_stats in stats.items():
+        if label not in baseline:
+            continue
+        for name in percentiles:
+            if label_stats[name] > baseline[label][name] * tolerance:
+                regressions.append((label, name, baseline[label][name], label_stats[name]))
+    return regressions
+
+def print_report(stats):
+    print("== Frame times (ms) ==")
+    for label, label_stats in stats.items():
+        print(f"{label}: {label_stats['frames']} frames, p50 {label_stats['p50']:.2f}, p95 {label_stats['p95']:.2f}, "
+              f"p99 {label_stats['p99']:.2f}, max {label_stats['max']:.2f}, mean {label_stats['mean']:.2f}.")
+
+def benchmark_aes_window(frames_per_step=200):
+    "Frame times for every page of the AES window, with the debug overlay and a hovered button."
+    import sys
+    from os.path import join, dirname, abspath
+    sys.path.append(join(dirname(abspath(__file__)), "..", "MiniCryptographyTools"))
+    from aes_pygame import AESWindow
+
+    enable_headless_mode()
+    window = AESWindow()
+    script = [
+        ("page", "menu"), ("frames", frames_per_step),
+        ("label", "menu hovered"), ("mouse", (100, 150)), ("frames", frames_per_step),
+        ("label", "menu debug"), ("events", key_press(pygame.K_F3)), ("frames", frames_per_step),
+        ("events", key_press(pygame.K_F3)), ("label", None),
+    ]
+    for page_state in ("encrypt decrypt", "generate key", "text file", "credits"):
+        script += [("page", page_state), ("frames", frames_per_step)]
+    return get_frame_time_stats(run_benchmark(window, script))
+
+if __name__ == "__main__":
+    print_report(benchmark_aes_window())